@@ -0,0 +1,528 @@
+"""
+asyncio runtime for Alice (sender) and Bob (receiver)
+
+Works on CPython's asyncio and MicroPython's uasyncio. Serial input, radio
+RX/TX, decryption, LCD rendering and Telegram delivery run as separate
+tasks joined by bounded queues. The HTTPS post and the wait for ACKs use
+non-blocking I/O, so a slow post no longer stops Bob from receiving (and
+ACKing) the next ESP-NOW packet, nor does a send stop Alice typing.
+
+Hardware is passed in, so the runtime runs on Linux with stand-ins: any
+object with `async read_char()` as serial input, fake_espnow behind
+EspNowLink, lcd=None (or a mock) and a TelegramDelivery whose bot points
+at telegram_standin.
+"""
+
+import sys
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+from enigma import CacheMaquinas
+import instrument
+
+MICROPYTHON = sys.implementation.name == 'micropython'
+
+QUEUE_SIZE = 8
+INBOX_SIZE = 32          # decrypted messages waiting for the operator
+RX_WAIT_MS = 1000        # radio task wakes up at least this often (fragment expiry)
+LCD_MIN_INTERVAL_MS = 50 # coalesces bursts of screen updates
+SERIAL_POLL_MS = 20      # CPython only
+
+
+def sleep_ms(ms):
+    if hasattr(asyncio, 'sleep_ms'):
+        return asyncio.sleep_ms(ms)
+    return asyncio.sleep(ms / 1000)
+
+
+async def run_steps(steps):
+    """Drives a generator that yields ms to sleep (EspNowLink.send_steps)
+    and returns its result, letting the other tasks run meanwhile"""
+    try:
+        while True:
+            await sleep_ms(next(steps))
+    except StopIteration as e:
+        return e.value
+
+
+class Queue:
+    """Bounded FIFO between tasks (uasyncio has no Queue)"""
+
+    def __init__(self, maxsize=QUEUE_SIZE):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.high_water = 0
+        self._items = []
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+    def qsize(self):
+        return len(self._items)
+
+    def full(self):
+        return len(self._items) >= self.maxsize
+
+    def put_nowait(self, item):
+        """Adds item, or counts it as dropped and returns False when full"""
+        if self.full():
+            self.dropped += 1
+            return False
+        self._items.append(item)
+        if len(self._items) > self.high_water:
+            self.high_water = len(self._items)
+        self._not_empty.set()
+        if self.full():
+            self._not_full.clear()
+        return True
+
+    async def put(self, item):
+        while self.full():
+            await self._not_full.wait()
+        self.put_nowait(item)
+
+    async def get(self):
+        while not self._items:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        item = self._items.pop(0)
+        self._not_full.set()
+        return item
+
+
+class Inbox(Queue):
+    """Decrypted messages waiting for the operator, oldest first, with an
+    index of the waiting messages per sender MAC"""
+
+    def __init__(self, maxsize=INBOX_SIZE):
+        Queue.__init__(self, maxsize)
+        self.received = 0
+        self.by_sender = {}
+
+    def put_nowait(self, item):
+        if not Queue.put_nowait(self, item):
+            return False
+        self.received += 1
+        self.by_sender.setdefault(item[0], []).append(item)
+        return True
+
+    def _unindex(self, item):
+        # FIFO overall means FIFO per sender: the item is first in its list
+        waiting = self.by_sender[item[0]]
+        waiting.pop(0)
+        if not waiting:
+            del self.by_sender[item[0]]
+
+    async def get(self):
+        item = await Queue.get(self)
+        self._unindex(item)
+        return item
+
+    def take(self, count=None):
+        """Removes and returns up to `count` (default all) of the oldest items"""
+        if count is None:
+            count = len(self._items)
+        items = self._items[:count]
+        del self._items[:count]
+        for item in items:
+            self._unindex(item)
+        self._not_full.set()
+        return items
+
+    def senders(self):
+        """Waiting messages per sender MAC"""
+        return {mac: len(items) for mac, items in self.by_sender.items()}
+
+
+class RadioSignal:
+    """Wakes a task from the radio IRQ (MicroPython) or another thread (CPython)"""
+
+    def __init__(self):
+        if hasattr(asyncio, 'ThreadSafeFlag'):
+            self._flag = asyncio.ThreadSafeFlag()
+            self._loop = None
+        else:
+            self._flag = asyncio.Event()
+            self._loop = asyncio.get_running_loop()
+
+    def set(self, *args):
+        if self._loop is None:
+            self._flag.set()
+        else:
+            self._loop.call_soon_threadsafe(self._flag.set)
+
+    async def wait(self, timeout_ms):
+        try:
+            await asyncio.wait_for(self._flag.wait(), timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            pass
+        if self._loop is not None:
+            self._flag.clear()
+
+
+class SerialInput:
+    """Async single-character reader for the serial console"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdin
+        self._reader = None
+
+    async def read_char(self):
+        if MICROPYTHON:
+            if self._reader is None:
+                self._reader = asyncio.StreamReader(self.stream)
+            return await self._reader.read(1)
+        import select
+        while True:
+            ready, _, _ = select.select([self.stream], [], [], 0)
+            if ready:
+                return self.stream.read(1)
+            await sleep_ms(SERIAL_POLL_MS)
+
+
+class Console:
+    """Reads the serial console in its own task, so the instrumentation
+    summary key works whether or not anything is waiting for input.
+    `status` (optional) is called after the summary to print counters."""
+
+    def __init__(self, serial, maxsize=32, status=None):
+        self.serial = serial
+        self.keys = Queue(maxsize)
+        self.status = status
+
+    async def run(self):
+        while True:
+            char = await self.serial.read_char()
+            if char == instrument.SUMMARY_KEY:
+                instrument.summary()
+                if self.status:
+                    self.status()
+            elif char:
+                self.keys.put_nowait(char)
+
+    async def read_char(self):
+        return await self.keys.get()
+
+
+class Screen:
+    """Latest requested 16x2 LCD contents, drawn by its own task.
+
+    show(..., hold_ms=N) is a status message: after N ms the screen goes
+    back to the last thing shown without hold_ms, unless something else was
+    shown meanwhile, so the caller never has to sleep to let it be read.
+    """
+
+    def __init__(self, lcd):
+        self.lcd = lcd
+        self.lines = ('', '')
+        self._base = self.lines
+        self._hold_ms = 0
+        self._dirty = asyncio.Event()
+
+    def show(self, line1, line2='', hold_ms=0):
+        self.lines = (line1[:16], line2[:16])
+        if not hold_ms:
+            self._base = self.lines
+        self._hold_ms = hold_ms
+        self._dirty.set()
+
+    async def run(self):
+        while True:
+            await self._dirty.wait()
+            self._dirty.clear()
+            if self.lcd:
+                # Only the cells that changed reach the bus
+                self.lcd.show(*self.lines)
+            hold = self._hold_ms
+            await sleep_ms(LCD_MIN_INTERVAL_MS)
+            if hold and not self._dirty.is_set():
+                try:
+                    await asyncio.wait_for(self._dirty.wait(),
+                                           max(hold - LCD_MIN_INTERVAL_MS, 0) / 1000)
+                except asyncio.TimeoutError:
+                    self.show(*self._base)
+
+
+async def ask(serial, valid_options):
+    """Waits for one of valid_options on the serial console"""
+    while True:
+        char = await serial.read_char()
+        if char and char.upper() in valid_options:
+            return char.upper()
+
+
+def _run(tasks):
+    async def main():
+        await asyncio.gather(*[asyncio.create_task(t) for t in tasks])
+    asyncio.run(main())
+
+
+class Receiver:
+    """Bob: radio RX -> decrypt -> operator approval -> Telegram"""
+
+    def __init__(self, lcd, link, delivery, subst_cache=None, serial=None, queue_size=QUEUE_SIZE,
+                 wifi=None, machines=None, inbox_size=INBOX_SIZE):
+        self.link = link
+        self.delivery = delivery            # approved, waiting for Telegram
+        self.wifi = wifi
+        self.subst_cache = subst_cache
+        # Prepared machines per (rotors, positions); each packet gets a clone
+        self.machines = machines or CacheMaquinas(cache=subst_cache)
+        self.serial = Console(serial or SerialInput(), status=self.print_stats)
+        self.screen = Screen(lcd)
+        self.rx_queue = Queue(queue_size)   # packets waiting for decryption
+        self.inbox = Inbox(inbox_size)      # decrypted, waiting for the operator
+        self.approved = 0
+        self.ignored = 0
+        self._outbox_ready = asyncio.Event()
+        self._outbox_space = asyncio.Event()
+
+    async def radio_task(self):
+        signal = RadioSignal()
+        self.link.notify(signal.set)
+        while True:
+            packet = self.link.receive_json(0)
+            while packet:
+                # The frames are already ACKed, so nothing may be dropped
+                # from here on: wait for room instead. Meanwhile the driver
+                # holds (or refuses, unACKed) further frames and the sender
+                # retransmits or reports the failure.
+                await self.rx_queue.put(packet)
+                packet = self.link.receive_json(0)
+            await signal.wait(RX_WAIT_MS)
+
+    def decrypt(self, sender_mac, data):
+        """Returns the operator prompt tuple for a packet, or None for a bad key"""
+        encrypted_text = data.get('text', '')
+        rotors = data.get('rotors', [])
+        positions = data.get('pos', '')
+        try:
+            enigma = self.machines.maquina(rotors, positions)
+        except (ValueError, TypeError) as e:
+            print(f"\nBad key from {sender_mac}: {e}")
+            return None
+        decrypted_text = enigma.cifrar_bytes(encrypted_text.encode()).decode()
+        return sender_mac, rotors, positions, encrypted_text, decrypted_text
+
+    async def decrypt_task(self):
+        while True:
+            sender_mac, data = await self.rx_queue.get()
+            item = self.decrypt(sender_mac, data)
+            if item:
+                await self.inbox.put(item)
+
+    async def approve(self, item):
+        """Queues a decrypted message for Telegram, waiting for room"""
+        sender_mac, rotors, positions, encrypted_text, decrypted_text = item
+        print(f"Decrypted: {decrypted_text}")
+        msg_text = (
+            f"🔐 *ENIGMA DECRYPTED*\n\n"
+            f"⚙️ *Rotors:* `{'-'.join(rotors)}`\n"
+            f"📍 *Positions:* `{positions}`\n\n"
+            f"🔒 *Encrypted:* `{encrypted_text}`\n"
+            f"🔓 *Decrypted:* `{decrypted_text}`"
+        )
+        self.approved += 1
+        delivery = self.delivery
+        while delivery.full():
+            # Backpressure: the rest stays in the inbox meanwhile
+            self._outbox_ready.set()
+            self._outbox_space.clear()
+            await self._outbox_space.wait()
+        delivery.enqueue(msg_text)
+        self._outbox_ready.set()
+
+    async def operator_task(self):
+        self.screen.show("Waiting Alice...")
+        while True:
+            item = await self.inbox.get()
+            sender_mac, encrypted_text = item[0], item[3]
+            print(f"\nReceived from {sender_mac}: {encrypted_text}")
+            print(f"Message '{encrypted_text}' received.")
+            self.screen.show("Msg Received!", encrypted_text)
+            await sleep_ms(2000)
+
+            print("\n1: Decrypt")
+            print("2: Ignore")
+            waiting = self.inbox.qsize()
+            if waiting:
+                # Batch actions for the messages queued up behind this one
+                print(f"3: Decrypt all ({waiting} more waiting)")
+                print("4: Ignore all")
+                for mac, count in self.inbox.senders().items():
+                    print(f"   {mac}: {count}")
+                self.screen.show("1:Dec 2:Ignore", f"3:All 4:None +{waiting}")
+                choice = await ask(self.serial, ['1', '2', '3', '4'])
+            else:
+                self.screen.show("1: Decrypt", "2: Ignore")
+                choice = await ask(self.serial, ['1', '2'])
+
+            if choice == '1':
+                self.screen.show("Waiting Alice...")
+                await self.approve(item)
+            elif choice == '3':
+                self.screen.show("Waiting Alice...")
+                await self.approve(item)
+                # One at a time, so whatever the Telegram queue has no room
+                # for yet waits in the inbox
+                for _ in range(self.inbox.qsize()):
+                    await self.approve(self.inbox.take(1)[0])
+            else:
+                ignored = [item]
+                if choice == '4':
+                    ignored += self.inbox.take()
+                self.ignored += len(ignored)
+                print(f"Ignored {len(ignored)}.")
+                self.screen.show("Waiting Alice...")
+                self.screen.show("Ignored.", hold_ms=1000)
+
+    def stats(self):
+        """Queue depths and counters of the receive pipeline"""
+        inbox = self.inbox
+        link = self.link
+        return {
+            'received': inbox.received,
+            # Frames lost before they became messages; from the radio on
+            # the queues wait for room instead of dropping
+            'driver_dropped': link.driver_dropped(),
+            'reassembly_dropped': link.reassembler.dropped,
+            'reassembly_refused': link.reassembler.refused,
+            'duplicates': link.duplicates,
+            'rx_queue': self.rx_queue.qsize(),
+            'inbox': inbox.qsize(),
+            'inbox_high_water': inbox.high_water,
+            'approved': self.approved,
+            'ignored': self.ignored,
+            'senders': inbox.senders(),
+            'key_cache_hits': self.machines.aciertos,
+            'key_cache_misses': self.machines.fallos,
+        }
+
+    def print_stats(self):
+        for name, value in self.stats().items():
+            print("{:<24}{}".format(name, value))
+
+    async def telegram_task(self):
+        delivery = self.delivery
+        while True:
+            delay = delivery.ready_in_ms()
+            if delay is None:
+                self._outbox_ready.clear()
+                await self._outbox_ready.wait()
+                continue
+            if delay:
+                # Coalescing window or retry backoff
+                await sleep_ms(delay)
+                continue
+            self.screen.show("Sending Tgram...", hold_ms=30000)
+            success = await delivery.deliver()
+            self._outbox_space.set()
+            if success:
+                status = "Sent!"
+            elif delivery.pending():
+                status = "Retrying..."
+            else:
+                status = "Error!"
+            # Shown for a while without holding up the next batch
+            self.screen.show("Sending Tgram...", status, hold_ms=2000)
+
+    async def wifi_task(self):
+        while True:
+            await sleep_ms(self.wifi.poll())
+
+    def tasks(self):
+        tasks = [self.screen.run(), self.serial.run(), self.radio_task(), self.decrypt_task(),
+                 self.operator_task(), self.telegram_task()]
+        if self.wifi is not None:
+            tasks.append(self.wifi_task())
+        return tasks
+
+    def run(self):
+        _run(self.tasks())
+
+
+class Sender:
+    """Alice: serial typing -> live encryption on the LCD -> radio TX"""
+
+    def __init__(self, lcd, enigma, link, rotors, positions, target_mac, serial=None,
+                 queue_size=QUEUE_SIZE):
+        self.enigma = enigma
+        self.link = link
+        self.rotors = rotors
+        self.positions = positions
+        self.target_mac = target_mac
+        self.serial = Console(serial or SerialInput())
+        self.screen = Screen(lcd)
+        self.tx_queue = Queue(queue_size)
+        self.buffer_raw = ""
+        self.buffer_encrypted = ""
+
+    async def input_task(self):
+        self.screen.show("Ready to type...")
+        while True:
+            char = await self.serial.read_char()
+            if not char:
+                continue
+
+            if char == '\n' or char == '\r':
+                if self.buffer_encrypted:
+                    await self._confirm()
+                continue
+
+            if char == '\t':  # Tab to clear
+                self.buffer_raw = ""
+                self.buffer_encrypted = ""
+                self.enigma.reset()
+                print("\nCleared.")
+                self.screen.show("Cleared")
+                await sleep_ms(500)
+                self.screen.show("")
+                continue
+
+            if ' ' <= char <= '~':
+                encrypted_char = self.enigma.cifrar_letra(char)
+                self.buffer_raw += char
+                self.buffer_encrypted += encrypted_char
+                print(f"{char} -> {encrypted_char}")
+                self.screen.show(self.buffer_raw[-16:], self.buffer_encrypted[-16:])
+
+    async def _confirm(self):
+        print(f"\n\nMessage to send: {self.buffer_encrypted}")
+        print("Confirm send? (1=Yes, 2=No)")
+        self.screen.show(f"Send \"{self.buffer_raw[:10]}\"?", "1:Yes 2:No")
+
+        if await ask(self.serial, ['1', '2']) == '1':
+            print("Sending to Bob...")
+            self.screen.show("Ready to type...")
+            if not self.tx_queue.put_nowait(self.buffer_encrypted):
+                print("TX queue full, message dropped")
+            self.buffer_raw = ""
+            self.buffer_encrypted = ""
+            # Bob decrypts from the start positions in the packet
+            self.enigma.reset()
+        else:
+            print("Cancelled.")
+            self.screen.show("Cancelled")
+            await sleep_ms(1000)
+            self.screen.show(self.buffer_raw[-16:], self.buffer_encrypted[-16:])
+
+    async def tx_task(self):
+        while True:
+            text = await self.tx_queue.get()
+            self.screen.show("Sending...", hold_ms=30000)
+            success = await self.send(text)
+            self.screen.show("Sending...", "Sent!" if success else "Failed!", hold_ms=1000)
+
+    async def send(self, text):
+        """Sends one message to Bob; typing goes on while it waits for ACKs"""
+        return await run_steps(self.link.send_steps(self.target_mac, self.rotors,
+                                                    self.positions, text))
+
+    def tasks(self):
+        return [self.screen.run(), self.serial.run(), self.input_task(), self.tx_task()]
+
+    def run(self):
+        _run(self.tasks())
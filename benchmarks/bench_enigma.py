@@ -0,0 +1,196 @@
+"""
+Benchmarks for the Enigma cipher core (CPython, no hardware needed)
+
+Measures, for 3, 4 and 5 rotors:
+- MaquinaEnigma.__init__ construction cost
+- cifrar_letra latency
+- cifrar_mensaje throughput (chars/s) for messages from 16 B to 10 MB
+- peak memory of a cifrar_mensaje call
+
+Usage:
+    python benchmarks/bench_enigma.py --out results.json
+    python benchmarks/bench_enigma.py --compare benchmarks/baseline.json
+    python benchmarks/bench_enigma.py --quick --save-baseline benchmarks/baseline.json
+
+With --compare the exit status is 1 when any metric is worse than the
+baseline by more than --threshold (default 10%).
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from enigma import MaquinaEnigma  # noqa: E402
+
+ROTORES = {3: ['I', 'II', 'III'], 4: ['I', 'II', 'III', 'IV'], 5: ['I', 'II', 'III', 'IV', 'V']}
+TAMANOS = [16, 256, 4 * 1024, 64 * 1024, 1024 * 1024, 10 * 1024 * 1024]
+TAMANOS_RAPIDO = [16, 256, 4 * 1024, 64 * 1024]
+MEMORIA_TAMANO = 256 * 1024
+
+# Metric name -> True when larger is better
+SENTIDO = {
+    'construct_us': False,
+    'letter_ns': False,
+    'peak_bytes': False,
+    'throughput_cps': True,
+}
+
+
+def _texto(n, semilla=0):
+    """Reproducible message of n chars: mostly letters, some spaces/punctuation"""
+    rnd = random.Random(semilla)
+    base = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ' * 3 + 'abcdefghij  ,.'
+    bloque = ''.join(rnd.choice(base) for _ in range(min(n, 4096)))
+    return (bloque * (n // len(bloque) + 1))[:n] if bloque else ''
+
+
+def _mejor(funcion, repeticiones):
+    """Best wall time (s) of several runs, the least noisy estimate"""
+    mejor = None
+    for _ in range(repeticiones):
+        t = time.perf_counter()
+        funcion()
+        t = time.perf_counter() - t
+        if mejor is None or t < mejor:
+            mejor = t
+    return mejor
+
+
+def medir_construccion(rotores, repeticiones):
+    veces = 200
+    t = _mejor(lambda: [MaquinaEnigma(rotores, 'A' * len(rotores)) for _ in range(veces)], repeticiones)
+    return t / veces * 1e6
+
+
+def medir_letra(rotores, repeticiones):
+    maquina = MaquinaEnigma(rotores, 'A' * len(rotores))
+    letras = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ' * 200
+    cifrar = maquina.cifrar_letra
+
+    def ejecutar():
+        for c in letras:
+            cifrar(c)
+    return _mejor(ejecutar, repeticiones) / len(letras) * 1e9
+
+
+def medir_mensaje(rotores, n, repeticiones):
+    mensaje = _texto(n)
+    if n >= 1024 * 1024:
+        repeticiones = 1
+    t = _mejor(lambda: MaquinaEnigma(rotores, 'A' * len(rotores)).cifrar_mensaje(mensaje), repeticiones)
+    return n / t
+
+
+def medir_memoria(rotores):
+    mensaje = _texto(MEMORIA_TAMANO)
+    maquina = MaquinaEnigma(rotores, 'A' * len(rotores))
+    tracemalloc.start()
+    maquina.cifrar_mensaje(mensaje)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pico
+
+
+def ejecutar(tamanos, repeticiones, progreso=print):
+    resultados = {}
+    for num, rotores in sorted(ROTORES.items()):
+        progreso("{} rotors...".format(num))
+        fila = {
+            'construct_us': medir_construccion(rotores, repeticiones),
+            'letter_ns': medir_letra(rotores, repeticiones),
+            'peak_bytes': medir_memoria(rotores),
+            'throughput_cps': {},
+        }
+        for n in tamanos:
+            fila['throughput_cps'][str(n)] = medir_mensaje(rotores, n, repeticiones)
+        resultados[str(num)] = fila
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'repeats': repeticiones,
+        },
+        'results': resultados,
+    }
+
+
+def _valores(resultados):
+    """Flattens results into {(rotors, metric, size): value}"""
+    plano = {}
+    for num, fila in resultados['results'].items():
+        for metrica, valor in fila.items():
+            if isinstance(valor, dict):
+                for n, v in valor.items():
+                    plano[(num, metrica, n)] = v
+            else:
+                plano[(num, metrica, None)] = valor
+    return plano
+
+
+def comparar(actual, base, umbral):
+    """Returns a list of (key, baseline, current, change) for regressions"""
+    regresiones = []
+    nuevos = _valores(actual)
+    for clave, anterior in sorted(_valores(base).items(), key=str):
+        if clave not in nuevos or not anterior:
+            continue
+        cambio = (nuevos[clave] - anterior) / anterior
+        peor = -cambio if SENTIDO[clave[1]] else cambio
+        if peor > umbral:
+            regresiones.append((clave, anterior, nuevos[clave], cambio))
+    return regresiones
+
+
+def imprimir(resultados):
+    for num, fila in sorted(resultados['results'].items()):
+        print("\n{} rotors".format(num))
+        print("  construct     {:10.1f} us".format(fila['construct_us']))
+        print("  cifrar_letra  {:10.0f} ns/letter".format(fila['letter_ns']))
+        print("  peak memory   {:10d} B ({} B msg)".format(fila['peak_bytes'], MEMORIA_TAMANO))
+        for n, cps in sorted(fila['throughput_cps'].items(), key=lambda x: int(x[0])):
+            print("  {:>10} B   {:12.0f} chars/s".format(n, cps))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--out', help='write results as JSON to this file')
+    parser.add_argument('--compare', metavar='BASELINE', help='flag regressions against a stored JSON baseline')
+    parser.add_argument('--save-baseline', metavar='PATH', help='store these results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed relative slowdown (default 0.10)')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--quick', action='store_true', help='skip the 1 MB and 10 MB messages')
+    args = parser.parse_args(argv)
+
+    resultados = ejecutar(TAMANOS_RAPIDO if args.quick else TAMANOS, args.repeats)
+    imprimir(resultados)
+
+    for ruta in (args.out, args.save_baseline):
+        if ruta:
+            with open(ruta, 'w') as f:
+                json.dump(resultados, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        regresiones = comparar(resultados, base, args.threshold)
+        if regresiones:
+            print("\nREGRESSIONS (> {:.0%}):".format(args.threshold))
+            for (num, metrica, n), antes, ahora, cambio in regresiones:
+                nombre = metrica if n is None else "{}[{} B]".format(metrica, n)
+                print("  {} rotors {}: {:.4g} -> {:.4g} ({:+.1%})".format(num, nombre, antes, ahora, cambio))
+            return 1
+        print("\nNo regressions against {}".format(args.compare))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""
+Load test of the Alice -> Bob -> Telegram pipeline (CPython, no hardware needed)
+
+N simulated senders (threads, each with its own key) send messages over
+fake_espnow to one Receiver running the real async_runtime tasks on
+fake_board's hardware, Wi-Fi and Telegram stand-in; the operator approves
+everything. Reports messages per second and p50/p99 latency from the
+send to the plaintext being ready in Bob's inbox and to its arrival at
+"Telegram", with every drop counter along the way.
+
+Usage:
+    python benchmarks/bench_pipeline.py --senders 4 --messages 50
+    python benchmarks/bench_pipeline.py --senders 8 --rate 20 --loss 0.05 --out load.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import re
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import fake_board  # noqa: E402
+import fake_espnow  # noqa: E402
+
+ROTORES = ['I', 'II', 'III', 'IV', 'V']
+LETRAS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+ENTREGADO = re.compile(r'Decrypted:\* `LOAD (\d+) (\d+)')
+ESPERA_FINAL_S = 10   # for the last messages to reach Telegram
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, len(valores) * p // 100)]
+
+
+def _mac(mac):
+    return ':'.join('{:02X}'.format(b) for b in mac)
+
+
+def ejecutar(emisores, mensajes, tasa, longitud, perdida, latencia_ms, cola_telegram, semilla=0):
+    board = fake_board.install(loss=perdida, latency_ms=latencia_ms, seed=semilla)
+    # Only importable once the stand-in modules are in place
+    from async_runtime import Receiver
+    from enigma import MaquinaEnigma, CacheSustituciones
+    from esp_now_utils import EspNowLink
+    from i2c_lcd import I2cLcd
+    from telegram_bot import TelegramBot, TelegramDelivery
+    from wifi_manager import WifiManager
+
+    fake_espnow.set_mac(fake_board.BOB_MAC)
+    enlace_bob = EspNowLink()
+    bob = _mac(fake_board.BOB_MAC)
+    enlaces = []
+    for i in range(emisores):
+        fake_espnow.set_mac(bytes((0x02, 0, 0, 0, 1, i)))
+        enlace = EspNowLink()
+        enlace.add_peer(bob)
+        enlaces.append(enlace)
+
+    enviados = {}       # (sender, n) -> send time
+    fallos = []
+    candado = threading.Lock()
+
+    def emisor(i, enlace):
+        rnd = random.Random(semilla + i)
+        rotores = rnd.sample(ROTORES, 3)
+        posiciones = ''.join(rnd.choice(LETRAS) for _ in rotores)
+        inicio = time.monotonic()
+        for n in range(mensajes):
+            if tasa:
+                espera = inicio + n / tasa - time.monotonic()
+                if espera > 0:
+                    time.sleep(espera)
+            texto = "LOAD {} {} ".format(i, n)
+            texto += ''.join(rnd.choice(LETRAS) for _ in range(longitud - len(texto)))
+            cifrado = MaquinaEnigma(rotores, posiciones).cifrar_mensaje(texto)
+            with candado:
+                enviados[(i, n)] = time.monotonic()
+            if not enlace.send_packet(bob, rotores, posiciones, cifrado):
+                with candado:
+                    fallos.append((i, n))
+
+    descifrados = {}    # (sender, n) -> time the plaintext was ready for the inbox
+
+    async def principal():
+        wifi = WifiManager('ssid', 'password', enlace_bob, cache_file=None)
+        entrega = TelegramDelivery(TelegramBot('token', 'chat'), max_queue=cola_telegram, wifi=wifi)
+        receptor = Receiver(I2cLcd(board.I2C(), 0x27, 2, 16), enlace_bob, entrega,
+                            CacheSustituciones(), wifi=wifi)
+
+        descifrar = receptor.decrypt
+
+        def descifrar_medido(sender_mac, data):
+            item = descifrar(sender_mac, data)
+            if item:
+                _, emisor_n, n = item[4].split(' ', 3)[:3]
+                descifrados[(int(emisor_n), int(n))] = time.monotonic()
+            return item
+        receptor.decrypt = descifrar_medido
+
+        async def operador():
+            while True:
+                await receptor.approve(await receptor.inbox.get())
+
+        tareas = [asyncio.create_task(t) for t in (
+            receptor.screen.run(), receptor.radio_task(), receptor.decrypt_task(),
+            receptor.telegram_task(), receptor.wifi_task(), operador())]
+        while not wifi.is_ready():
+            await asyncio.sleep(0.01)
+
+        hilos = [threading.Thread(target=emisor, args=(i, enlace), daemon=True)
+                 for i, enlace in enumerate(enlaces)]
+        inicio = time.monotonic()
+        for hilo in hilos:
+            hilo.start()
+        while any(hilo.is_alive() for hilo in hilos):
+            await asyncio.sleep(0.05)
+        limite = time.monotonic() + ESPERA_FINAL_S
+        while time.monotonic() < limite:
+            if receptor.rx_queue.qsize() == 0 and \
+                    entrega.sent + entrega.failed + entrega.dropped >= len(descifrados):
+                break
+            await asyncio.sleep(0.05)
+        for tarea in tareas:
+            tarea.cancel()
+        return inicio, receptor.stats(), entrega
+
+    # The receiver prints every message; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio, estadisticas, entrega = asyncio.run(principal())
+
+    entregados = {}
+    for texto, llegada in zip(board.telegram.messages, board.telegram.arrivals):
+        for m in ENTREGADO.finditer(texto):
+            entregados[(int(m.group(1)), int(m.group(2)))] = llegada
+
+    def resumen(llegadas):
+        latencias = [(t - enviados[k]) * 1000 for k, t in llegadas.items() if k in enviados]
+        duracion = max(llegadas.values()) - inicio if llegadas else 0
+        return {
+            'messages': len(llegadas),
+            'msgs_per_s': len(llegadas) / duracion if duracion else 0.0,
+            'p50_ms': _percentil(latencias, 50),
+            'p99_ms': _percentil(latencias, 99),
+            'max_ms': max(latencias) if latencias else 0.0,
+        }
+
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'config': {
+            'senders': emisores, 'messages': mensajes, 'rate': tasa, 'length': longitud,
+            'loss': perdida, 'latency_ms': latencia_ms, 'telegram_queue': cola_telegram,
+        },
+        'results': {
+            'sent': len(enviados),
+            'send_failures': len(fallos),
+            'decrypted': resumen(descifrados),
+            'delivered': resumen(entregados),
+            'drops': {
+                'air_lost': board.air.lost,
+                'driver': estadisticas['driver_dropped'],
+                'reassembly': estadisticas['reassembly_dropped'],
+                'duplicates': estadisticas['duplicates'],
+                'telegram_queue': entrega.dropped,
+                'telegram_failed': entrega.failed,
+            },
+            'inbox_high_water': estadisticas['inbox_high_water'],
+            'key_cache_hits': estadisticas['key_cache_hits'],
+            'key_cache_misses': estadisticas['key_cache_misses'],
+        },
+    }
+
+
+def imprimir(resultados):
+    c = resultados['config']
+    r = resultados['results']
+    print("{} senders x {} messages of {} chars, rate {}, loss {:.0%}, latency {} ms".format(
+        c['senders'], c['messages'], c['length'], c['rate'] or 'max', c['loss'], c['latency_ms']))
+    print("  sent          {:8d}   ({} send failures)".format(r['sent'], r['send_failures']))
+    print("  {:<12}{:>9}{:>10}{:>10}{:>10}{:>10}".format('', 'msgs', 'msgs/s', 'p50 ms', 'p99 ms', 'max ms'))
+    for etapa in ('decrypted', 'delivered'):
+        e = r[etapa]
+        print("  {:<12}{:>9}{:>10.1f}{:>10.1f}{:>10.1f}{:>10.1f}".format(
+            etapa, e['messages'], e['msgs_per_s'], e['p50_ms'], e['p99_ms'], e['max_ms']))
+    print("  drops         " + ", ".join("{} {}".format(k, v) for k, v in r['drops'].items()))
+    print("  inbox high water {}, key cache {} hits / {} misses".format(
+        r['inbox_high_water'], r['key_cache_hits'], r['key_cache_misses']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--senders', type=int, default=4)
+    parser.add_argument('--messages', type=int, default=50, help='messages per sender')
+    parser.add_argument('--rate', type=float, default=0, help='messages/s per sender (default: as fast as possible)')
+    parser.add_argument('--length', type=int, default=40, help='characters per message')
+    parser.add_argument('--loss', type=float, default=0.0, help='frame loss probability on the air')
+    parser.add_argument('--latency-ms', type=float, default=2)
+    parser.add_argument('--telegram-queue', type=int, default=16, help='TelegramDelivery max_queue')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='write results as JSON to this file')
+    args = parser.parse_args(argv)
+    if not 0 < args.senders <= 200:
+        parser.error("--senders must be 1-200")
+
+    resultados = ejecutar(args.senders, args.messages, args.rate, max(args.length, 16), args.loss,
+                          args.latency_ms, args.telegram_queue, args.seed)
+    imprimir(resultados)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(resultados, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
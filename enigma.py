@@ -2,39 +2,220 @@
 Core Enigma Machine Logic for MicroPython
 """
 
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ucollections import OrderedDict
+
+ALFABETO = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def _tabla(cableado):
+    """Converts a wiring string into a table of letter indices (0-25)"""
+    return bytes(ord(c) - 65 for c in cableado)
+
+
+def _inversa(tabla):
+    """Builds the inverse permutation of a wiring table"""
+    inversa = bytearray(26)
+    for i, j in enumerate(tabla):
+        inversa[j] = i
+    return bytes(inversa)
+
+
+def _anillos(anillos, n):
+    """Ring settings (Ringstellung) as offsets 0-25.
+
+    Accepts letters ('AAA', A = ring 01) or numbers 1-26, like the key
+    sheets; missing rotors default to A.
+    """
+    resultado = [0] * n
+    for i, anillo in enumerate(anillos or ()):
+        if i >= n:
+            break
+        valor = ALFABETO.find(anillo.upper()) if isinstance(anillo, str) else anillo - 1
+        if not 0 <= valor < 26:
+            raise ValueError("Anillo no válido: {}".format(anillo))
+        resultado[i] = valor
+    return resultado
+
+
+def _clavijas(pares):
+    """Plugboard (Steckerbrett) permutation from pairs like 'AV BS CG' or ['AV', 'BS']"""
+    tabla = bytearray(range(26))
+    if isinstance(pares, str):
+        pares = pares.split()
+    for par in pares or ():
+        par = ''.join(par).upper()
+        if len(par) != 2:
+            raise ValueError("Clavija no válida: {}".format(par))
+        a = ALFABETO.find(par[0])
+        b = ALFABETO.find(par[1])
+        if a < 0 or b < 0 or a == b or tabla[a] != a or tabla[b] != b:
+            raise ValueError("Clavija no válida: {}".format(par))
+        tabla[a] = b
+        tabla[b] = a
+    return bytes(tabla)
+
+
+def _paso(pos, notches):
+    """One key press on a list of rotor positions (leftmost first).
+
+    The rightmost rotor always steps. The pawl to the left of each rotor
+    engages when that rotor sits on its notch and steps both it and its
+    left neighbour, so a middle rotor on its notch moves again on the next
+    press (the double step). Returns True if a middle rotor has just landed
+    on its notch, i.e. the next press needs this full rule again.
+    """
+    derecha = len(pos) - 1
+    arrastre = pos[derecha] == notches[derecha]
+    pos[derecha] = (pos[derecha] + 1) % 26
+    medio = False
+    for j in range(derecha - 1, -1, -1):
+        p = pos[j]
+        en_notch = j > 0 and p == notches[j]
+        if arrastre or en_notch:
+            p = (p + 1) % 26
+            pos[j] = p
+            medio = medio or (j > 0 and p == notches[j])
+        arrastre = en_notch
+    return medio
+
+
+def _clave_cache(id_firma, pos):
+    """CacheSustituciones key: the firma id above five 5-bit position slots,
+    rightmost rotor lowest, unused slots zero. The fixed width keeps keys of
+    machines with different rotor counts apart."""
+    clave = 0
+    for p in pos:
+        clave = (clave << 5) | p
+    return (id_firma << 25) | clave
+
+
+def _medio_en_notch(pos, notches):
+    """True if a middle rotor is on its notch (it will double-step)"""
+    for j in range(1, len(pos) - 1):
+        if pos[j] == notches[j]:
+            return True
+    return False
+
+
+def _contar(extras, inicio, periodo, t, maximo):
+    """Pulses up to press t: the early ones in `extras`, then every
+    `periodo` presses from `inicio`"""
+    cuenta = maximo((t - inicio) // periodo + 1, 0)
+    for e in extras:
+        cuenta = cuenta + (t >= e)
+    return cuenta
+
+
+def pasos_rotores(posiciones, notches, n, maximo=max):
+    """How many times each rotor has stepped after n key presses (closed form).
+
+    The rightmost rotor steps on every press. Each other rotor steps on the
+    presses where its right neighbour sits on its notch (a pulse); a middle
+    rotor that lands on its own notch steps once more on the next press, and
+    that press is a pulse for its left neighbour. Pulses are therefore at
+    most one early press plus an arithmetic progression (period 26, times
+    25 per rotor), so the counts take a few integer operations however
+    large n is. `n` may also be a NumPy array, with maximo=np.maximum.
+    """
+    derecha = len(posiciones) - 1
+    pasos = [0] * (derecha + 1)
+    pasos[derecha] = n
+    # Pulses felt by the next rotor to the left
+    extras = ()
+    inicio = (notches[derecha] - posiciones[derecha]) % 26 + 1
+    periodo = 26
+    for j in range(derecha - 1, 0, -1):
+        notch = notches[j]
+        cabeza = posiciones[j] == notch
+        if cabeza:
+            # Already on its notch: steps on the first press, which absorbs
+            # any pulse arriving then
+            extras = tuple(e for e in extras if e != 1)
+            if inicio == 1:
+                inicio += periodo
+            hasta_notch = 25
+        else:
+            hasta_notch = (notch - posiciones[j]) % 26
+        # The pulses numbered hasta_notch, +25, +50... land it on its notch
+        previos = _contar(extras, inicio, periodo, n - 1, maximo)
+        pasos[j] = (cabeza * (n >= 1) + _contar(extras, inicio, periodo, n, maximo)
+                    + maximo((previos - hasta_notch) // 25 + 1, 0))
+
+        salida = (1,) if cabeza else ()
+        k = hasta_notch
+        while k <= len(extras):
+            salida += (extras[k - 1] + 1,)
+            k += 25
+        inicio = inicio + periodo * (k - 1 - len(extras)) + 1
+        periodo *= 25
+        extras = salida
+    pasos[0] = _contar(extras, inicio, periodo, n, maximo)
+    return pasos
+
+
 class Rotor:
     """Rotor of the Enigma Machine"""
     
-    def __init__(self, numero, cableado, notch):
+    def __init__(self, numero, cableado, notch, anillo=0):
         self.numero = numero
         self.cableado = cableado
-        self.alfabeto = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+        self.alfabeto = ALFABETO
         self.notch = notch
+        self.anillo = anillo
         self.posicion = 0
+        # Integer lookup tables, built once so the signal path never searches
+        # strings. The ring setting is folded in by shifting the wiring, so
+        # the signal path only ever deals with the window position.
+        tabla = _tabla(cableado)
+        self.adelante = bytes((tabla[(i - anillo) % 26] + anillo) % 26 for i in range(26))
+        self.atras = _inversa(self.adelante)
+        self.indice_notch = ord(notch) - 65
         
+    def indice_adelante(self, indice):
+        """Right to left pass on a letter index (0-25)"""
+        p = self.posicion
+        return (self.adelante[(indice + p) % 26] - p) % 26
+    
+    def indice_atras(self, indice):
+        """Left to right pass on a letter index (0-25)"""
+        p = self.posicion
+        return (self.atras[(indice + p) % 26] - p) % 26
+    
     def cifrar_adelante(self, letra):
         """Encrypts a letter passing through the rotor from right to left"""
-        indice = (self.alfabeto.index(letra) + self.posicion) % 26
-        letra_cifrada = self.cableado[indice]
-        indice_salida = (self.alfabeto.index(letra_cifrada) - self.posicion) % 26
-        return self.alfabeto[indice_salida]
+        return ALFABETO[self.indice_adelante(ord(letra) - 65)]
     
     def cifrar_atras(self, letra):
         """Encrypts a letter on the return path"""
-        indice = (self.alfabeto.index(letra) + self.posicion) % 26
-        letra_ajustada = self.alfabeto[indice]
-        indice_cableado = self.cableado.index(letra_ajustada)
-        indice_salida = (indice_cableado - self.posicion) % 26
-        return self.alfabeto[indice_salida]
+        return ALFABETO[self.indice_atras(ord(letra) - 65)]
     
     def avanzar(self):
         """Advances the rotor by one position"""
         self.posicion = (self.posicion + 1) % 26
-        return self.alfabeto[self.posicion] == self.notch
     
     def set_posicion(self, letra):
         """Sets the initial position of the rotor"""
-        self.posicion = self.alfabeto.index(letra)
+        posicion = self.alfabeto.find(letra)
+        if posicion < 0 or len(letra) != 1:
+            raise ValueError("Posición no válida: {}".format(letra))
+        self.posicion = posicion
+    
+    def clone(self):
+        """Copy sharing the (read-only) tables; only the position is its own"""
+        copia = object.__new__(Rotor)
+        copia.numero = self.numero
+        copia.cableado = self.cableado
+        copia.alfabeto = self.alfabeto
+        copia.notch = self.notch
+        copia.anillo = self.anillo
+        copia.posicion = self.posicion
+        copia.adelante = self.adelante
+        copia.atras = self.atras
+        copia.indice_notch = self.indice_notch
+        return copia
 
 
 class Reflector:
@@ -42,6 +223,10 @@ class Reflector:
     
     def __init__(self, cableado):
         self.cableado = cableado
+        self.tabla = _tabla(cableado)
+        
+    def reflejar_indice(self, indice):
+        return self.tabla[indice]
         
     def reflejar(self, letra):
         indice = ord(letra) - ord('A')
@@ -61,25 +246,75 @@ class MaquinaEnigma:
     
     REFLECTOR_B = 'YRUHQSLDPXNGOKMIEBFZCWVJAT'
     
-    def __init__(self, seleccion_rotores, posiciones_iniciales='AAA'):
-        """Initializes the Enigma Machine"""
+    REFLECTORES = {
+        'B': REFLECTOR_B,
+        'C': 'FVPJIAOYEDRZXWGCTKUQSBNMHL',
+        'B-THIN': 'ENKQAUYWJICOPBLMDXZVFTHRGS',
+        'C-THIN': 'RDOBJNTKVEHMLFCWZAXGYIPSUQ',
+    }
+    
+    def __init__(self, seleccion_rotores, posiciones_iniciales='AAA', cache=None,
+                 anillos=None, clavijas=None, reflector='B'):
+        """Initializes the Enigma Machine
+
+        `anillos` are the ring settings ('AAA' or [1, 1, 1]), `clavijas` the
+        plugboard pairs ('AV BS CG') and `reflector` one of REFLECTORES.
+        `cache` is an optional CacheSustituciones shared between machines.
+        """
         if len(seleccion_rotores) < 3 or len(seleccion_rotores) > 5:
             raise ValueError("Must select between 3 and 5 rotors")
         
+        anillos = _anillos(anillos, len(seleccion_rotores))
         self.rotores = []
         for i, num_rotor in enumerate(seleccion_rotores):
             if num_rotor not in self.ROTORES_DISPONIBLES:
                 raise ValueError("Rotor {} no válido".format(num_rotor))
             
             config = self.ROTORES_DISPONIBLES[num_rotor]
-            rotor = Rotor(num_rotor, config['cableado'], config['notch'])
+            rotor = Rotor(num_rotor, config['cableado'], config['notch'], anillos[i])
             
             if i < len(posiciones_iniciales):
                 rotor.set_posicion(posiciones_iniciales[i])
             
             self.rotores.append(rotor)
         
-        self.reflector = Reflector(self.REFLECTOR_B)
+        nombre_reflector = reflector.upper()
+        if nombre_reflector not in self.REFLECTORES:
+            raise ValueError("Reflector {} no válido".format(reflector))
+        self.reflector = Reflector(self.REFLECTORES[nombre_reflector])
+        
+        # The plugboard is folded into the byte <-> letter index translation
+        # at both ends of the signal path
+        self.clavijas = _clavijas(clavijas)
+        entrada = bytearray(b'\xff' * 256)
+        for i in range(26):
+            entrada[65 + i] = entrada[97 + i] = self.clavijas[i]
+        self.entrada = bytes(entrada)
+        self.salida = bytes(c + 65 for c in self.clavijas)
+        
+        # Identifies the wiring, positions aside, for the substitution cache
+        # (its tables cover rotors and reflector; the plugboard is applied
+        # around them)
+        self.firma = (tuple(seleccion_rotores), tuple(anillos), nombre_reflector)
+        self.cache = cache
+        # Start positions and key presses since then, for reset/seek/tell
+        self.posiciones_iniciales = [r.posicion for r in self.rotores]
+        self.pulsaciones = 0
+    
+    def clone(self):
+        """Independent machine in the same state, without rebuilding or
+        validating anything: the tables are shared, the rotor positions copied"""
+        copia = object.__new__(MaquinaEnigma)
+        copia.rotores = [r.clone() for r in self.rotores]
+        copia.reflector = self.reflector
+        copia.clavijas = self.clavijas
+        copia.entrada = self.entrada
+        copia.salida = self.salida
+        copia.firma = self.firma
+        copia.cache = self.cache
+        copia.posiciones_iniciales = list(self.posiciones_iniciales)
+        copia.pulsaciones = self.pulsaciones
+        return copia
     
     def cifrar_letra(self, letra):
         """Encrypts a single letter"""
@@ -87,32 +322,289 @@ class MaquinaEnigma:
         if not (letra >= 'A' and letra <= 'Z') and not (letra >= 'a' and letra <= 'z'):
             return letra
         
-        letra = letra.upper()
         self._avanzar_rotores()
-        
+        indice = self.clavijas[(ord(letra) & 0xDF) - 65]
+        if self.cache is not None:
+            return chr(self.salida[self._sustitucion()[indice]])
+        return chr(self.salida[self._cifrar_indice(indice)])
+    
+    def _cifrar_indice(self, indice):
+        """Runs a letter index (0-25) through the rotors and reflector (no plugboard)"""
         for rotor in reversed(self.rotores):
-            letra = rotor.cifrar_adelante(letra)
+            p = rotor.posicion
+            indice = (rotor.adelante[(indice + p) % 26] - p) % 26
         
-        letra = self.reflector.reflejar(letra)
+        indice = self.reflector.tabla[indice]
         
         for rotor in self.rotores:
-            letra = rotor.cifrar_atras(letra)
+            p = rotor.posicion
+            indice = (rotor.atras[(indice + p) % 26] - p) % 26
         
-        return letra
+        return indice
+    
+    def _sustitucion(self):
+        """Full 26-letter substitution for the current offsets, via the cache"""
+        clave = _clave_cache(self.cache.registrar(self.firma), [r.posicion for r in self.rotores])
+        tabla = self.cache.get(clave)
+        if tabla is None:
+            tabla = bytes(self._cifrar_indice(i) for i in range(26))
+            self.cache.put(clave, tabla)
+        return tabla
     
     def _avanzar_rotores(self):
-        """Advances the rotors according to Enigma mechanics"""
-        avanzar_siguiente = self.rotores[-1].avanzar()
-        
-        for i in range(len(self.rotores) - 2, -1, -1):
-            if avanzar_siguiente:
-                avanzar_siguiente = self.rotores[i].avanzar()
-            else:
-                break
+        """Advances the rotors according to Enigma mechanics, double step included (see _paso)"""
+        self.pulsaciones += 1
+        rotores = self.rotores
+        j = len(rotores) - 1
+        arrastre = rotores[j].posicion == rotores[j].indice_notch
+        rotores[j].avanzar()
+        for j in range(j - 1, -1, -1):
+            rotor = rotores[j]
+            en_notch = j > 0 and rotor.posicion == rotor.indice_notch
+            if arrastre or en_notch:
+                rotor.avanzar()
+            arrastre = en_notch
+    
+    def reset(self):
+        """Returns the rotors to their initial positions"""
+        self.seek(0)
+    
+    def tell(self):
+        """Number of key presses (letters) since the initial positions"""
+        return self.pulsaciones
+    
+    def seek(self, n):
+        """Sets the rotors to their state after n key presses.
+
+        Computed directly with pasos_rotores instead of stepping n times.
+        """
+        if n < 0:
+            raise ValueError("Offset must be >= 0")
+        notches = [r.indice_notch for r in self.rotores]
+        pasos = pasos_rotores(self.posiciones_iniciales, notches, n)
+        for rotor, inicial, k in zip(self.rotores, self.posiciones_iniciales, pasos):
+            rotor.posicion = (inicial + k) % 26
+        self.pulsaciones = n
     
     def cifrar_mensaje(self, mensaje):
-        """Encrypts a complete message"""
-        resultado = []
-        for letra in mensaje:
-            resultado.append(self.cifrar_letra(letra))
-        return ''.join(resultado)
+        """Encrypts a complete message.
+
+        Same result as cifrar_letra on every character: non-ASCII text is
+        UTF-8 bytes >= 0x80, which pass through cifrar_bytes unchanged.
+        """
+        return self.cifrar_bytes(mensaje.encode('utf-8')).decode('utf-8')
+
+    def cifrar_bytes(self, datos, salida=None):
+        """Encrypts a bytes/bytearray/memoryview message in a single pass.
+
+        Letters of either case come out as uppercase ASCII and every other
+        byte is copied through unchanged. The result goes into a new
+        bytearray, or into `salida` (which may be `datos` itself) when given.
+        """
+        n = len(datos)
+        if salida is None:
+            salida = bytearray(n)
+        elif len(salida) < n:
+            raise ValueError("Output buffer too small")
+        # Every letter of a message is at new offsets, so a message longer
+        # than the cache would only cycle through it, evicting each table
+        # before it is reused: skip the cache for those
+        if self.cache is not None and n <= self.cache.max_entradas:
+            return self._cifrar_bytes_cache(datos, salida, n)
+
+        rotores = self.rotores
+        pos = [r.posicion for r in rotores]
+        notches = [r.indice_notch for r in rotores]
+        adelante = [r.adelante for r in rotores]
+        atras = [r.atras for r in rotores]
+        reflector = self.reflector.tabla
+        entrada = self.entrada
+        letra_salida = self.salida
+        derecha = len(rotores) - 1
+        notch_derecha = notches[derecha]
+        medio = _medio_en_notch(pos, notches)
+        ida = range(derecha, -1, -1)
+        vuelta = range(derecha + 1)
+        letras = 0
+
+        for k in range(n):
+            c = datos[k]
+            # Letter index after the plugboard, 255 for anything else
+            indice = entrada[c]
+            if indice == 255:
+                salida[k] = c
+                continue
+            letras += 1
+
+            # Stepping, same rules as _avanzar_rotores; only the rightmost
+            # rotor moves unless a notch is involved
+            p = pos[derecha]
+            if p == notch_derecha or medio:
+                medio = _paso(pos, notches)
+            else:
+                pos[derecha] = p + 1 if p < 25 else 0
+
+            for j in ida:
+                p = pos[j]
+                indice = (adelante[j][(indice + p) % 26] - p) % 26
+            indice = reflector[indice]
+            for j in vuelta:
+                p = pos[j]
+                indice = (atras[j][(indice + p) % 26] - p) % 26
+            salida[k] = letra_salida[indice]
+
+        for r, p in zip(rotores, pos):
+            r.posicion = p
+        self.pulsaciones += letras
+        return salida
+
+    def _cifrar_bytes_cache(self, datos, salida, n):
+        """cifrar_bytes variant that encrypts each letter with one table lookup"""
+        cache = self.cache
+        rotores = self.rotores
+        pos = [r.posicion for r in rotores]
+        notches = [r.indice_notch for r in rotores]
+        entrada = self.entrada
+        letra_salida = self.salida
+        derecha = len(rotores) - 1
+        notch_derecha = notches[derecha]
+        medio = _medio_en_notch(pos, notches)
+        # Same key layout as _sustitucion, kept up to date as the rotors step
+        id_firma = cache.registrar(self.firma)
+        clave = _clave_cache(id_firma, pos)
+        obtener = cache.get
+        letras = 0
+
+        for k in range(n):
+            c = datos[k]
+            indice = entrada[c]
+            if indice == 255:
+                salida[k] = c
+                continue
+            letras += 1
+
+            p = pos[derecha]
+            if p == notch_derecha or medio:
+                medio = _paso(pos, notches)
+                clave = _clave_cache(id_firma, pos)
+            elif p < 25:
+                pos[derecha] = p + 1
+                clave += 1
+            else:
+                pos[derecha] = 0
+                clave -= 25
+
+            tabla = obtener(clave)
+            if tabla is None:
+                for r, p in zip(rotores, pos):
+                    r.posicion = p
+                tabla = bytes(self._cifrar_indice(i) for i in range(26))
+                cache.put(clave, tabla)
+            salida[k] = letra_salida[tabla[indice]]
+
+        for r, p in zip(rotores, pos):
+            r.posicion = p
+        self.pulsaciones += letras
+        return salida
+
+
+class CacheLRU:
+    """Small LRU map with a fixed number of entries"""
+
+    def __init__(self, max_entradas):
+        self.max_entradas = max(1, max_entradas)
+        self._datos = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def __len__(self):
+        return len(self._datos)
+
+    def get(self, clave):
+        """Returns the cached value (marking it as recently used) or None"""
+        datos = self._datos
+        valor = datos.get(clave)
+        if valor is None:
+            self.fallos += 1
+            return None
+        if hasattr(datos, 'move_to_end'):
+            datos.move_to_end(clave)
+        else:
+            # MicroPython's OrderedDict has no move_to_end
+            datos[clave] = datos.pop(clave)
+        self.aciertos += 1
+        return valor
+
+    def put(self, clave, valor):
+        self._datos.pop(clave, None)
+        while len(self._datos) >= self.max_entradas:
+            self._datos.pop(next(iter(self._datos)))
+        self._datos[clave] = valor
+
+    def clear(self):
+        self._datos = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+
+class CacheSustituciones(CacheLRU):
+    """Cache of full substitutions keyed by (wiring, rotor offsets).
+
+    The wiring is the machine's firma: rotor selection, ring settings and
+    reflector. The plugboard sits outside the cached tables, so keys that
+    differ only in their plugs share entries.
+
+    Each entry is the 26-byte permutation produced by the complete
+    forward -> reflector -> backward path at one set of offsets, so a cached
+    letter costs a single lookup. The size is capped by `memoria_max` bytes
+    (an estimate including interpreter overhead), e.g. a few KB on the ESP32.
+    MaquinaEnigma.cifrar_bytes bypasses it for messages longer than the
+    cache, which would only thrash it.
+    """
+
+    BYTES_POR_ENTRADA = 96
+
+    def __init__(self, memoria_max=16 * 1024):
+        CacheLRU.__init__(self, memoria_max // self.BYTES_POR_ENTRADA)
+        self.memoria_max = memoria_max
+        self._firmas = {}
+
+    def registrar(self, firma):
+        """Small integer id for a rotor selection, used as the key prefix"""
+        id_firma = self._firmas.get(firma)
+        if id_firma is None:
+            id_firma = self._firmas[firma] = len(self._firmas) + 1
+        return id_firma
+
+
+class CacheMaquinas(CacheLRU):
+    """Prepared machines keyed by (rotor selection, start positions).
+
+    A receiver sees the same key over and over, so it keeps the built
+    machine as a template and hands out clones of it. The number of
+    templates is capped by `memoria_max` bytes (an estimate of a 5-rotor
+    machine on MicroPython).
+    """
+
+    BYTES_POR_ENTRADA = 1536
+
+    def __init__(self, memoria_max=6 * 1024, cache=None):
+        CacheLRU.__init__(self, memoria_max // self.BYTES_POR_ENTRADA)
+        self.memoria_max = memoria_max
+        self.cache = cache
+
+    def maquina(self, rotores, posiciones):
+        """Fresh machine at the start positions; raises ValueError for a bad key"""
+        clave = (tuple(rotores), posiciones)
+        plantilla = self.get(clave)
+        if plantilla is None:
+            plantilla = MaquinaEnigma(rotores, posiciones, cache=self.cache)
+            self.put(clave, plantilla)
+        return plantilla.clone()
+
+
+if __name__ == '__main__':
+    # Host-side command line: python -m enigma --help
+    import sys
+    from enigma_cli import main
+    sys.exit(main())
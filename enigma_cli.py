@@ -0,0 +1,142 @@
+"""
+Command-line Enigma for verifying device traffic on a PC
+
+    python -m enigma --rotors I,II,III --pos ABC capture.txt -o plain.txt
+    python -m enigma --rotors '["I","II","III"]' --pos ABC --in-place capture.txt
+    python -m enigma --rotors I-II-III --pos ABC --text "QMJIDO MZWZJFJR"
+    python -m enigma -r II,IV,V -p BLA --rings BUL --plugboard "AV BS CG" --text ...
+    cat capture.txt | python -m enigma --rotors I,II,III --pos ABC -
+
+The key uses the same format as the ESP-NOW packet's `rotors`/`pos`
+fields; ring settings, plugboard and reflector are optional. Enigma is symmetric, so the same command encrypts and decrypts.
+Files are processed through mmap, so they are never loaded into Python
+strings.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import sys
+
+from enigma import MaquinaEnigma
+from enigma_stream import copiar
+
+BLOQUE = 1 << 20
+
+
+def parse_rotors(valor):
+    """Accepts 'I,II,III', 'I-II-III', 'I II III' or a JSON list like the packet"""
+    valor = valor.strip()
+    if valor.startswith('['):
+        return [str(r) for r in json.loads(valor)]
+    for sep in (',', '-', ' '):
+        if sep in valor:
+            return [r.strip().upper() for r in valor.split(sep) if r.strip()]
+    return [valor.upper()]
+
+
+def _no_negativo(valor):
+    numero = int(valor)
+    if numero < 0:
+        raise argparse.ArgumentTypeError("must be >= 0: {}".format(valor))
+    return numero
+
+
+def _transformar(maquina, origen, destino, tamano):
+    """Runs cifrar_bytes over two buffers in blocks"""
+    fuente = memoryview(origen)
+    salida = memoryview(destino)
+    try:
+        for inicio in range(0, tamano, BLOQUE):
+            fin = min(inicio + BLOQUE, tamano)
+            maquina.cifrar_bytes(fuente[inicio:fin], salida[inicio:fin])
+    finally:
+        fuente.release()
+        salida.release()
+
+
+def cifrar_archivo(maquina, ruta, ruta_salida=None):
+    """Encrypts `ruta` into `ruta_salida`, or in place when it is None"""
+    if ruta_salida is not None and os.path.exists(ruta_salida) and os.path.samefile(ruta, ruta_salida):
+        # Opening the output would truncate the input before it is read
+        ruta_salida = None
+    if ruta_salida is None:
+        with open(ruta, 'r+b') as f:
+            tamano = os.fstat(f.fileno()).st_size
+            if not tamano:
+                return 0
+            with mmap.mmap(f.fileno(), 0) as mapa:
+                _transformar(maquina, mapa, mapa, tamano)
+                mapa.flush()
+        return tamano
+
+    with open(ruta, 'rb') as f_in, open(ruta_salida, 'w+b') as f_out:
+        tamano = os.fstat(f_in.fileno()).st_size
+        f_out.truncate(tamano)
+        if not tamano:
+            return 0
+        with mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ) as entrada, \
+                mmap.mmap(f_out.fileno(), 0) as salida:
+            _transformar(maquina, entrada, salida, tamano)
+            salida.flush()
+    return tamano
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m enigma',
+        description="Encrypt/decrypt files with the Enigma machine (symmetric).")
+    parser.add_argument('input', nargs='?', help="input file, or - for stdin")
+    parser.add_argument('-o', '--output', help="output file (- for stdout)")
+    parser.add_argument('-r', '--rotors', required=True, help="rotor selection, e.g. I,II,III or '[\"I\",\"II\",\"III\"]'")
+    parser.add_argument('-p', '--pos', default='', help="start positions, e.g. ABC (default all A)")
+    parser.add_argument('--rings', default='', help="ring settings, e.g. BUL or 2,21,12 (default all A)")
+    parser.add_argument('--plugboard', default='', help="plugboard pairs, e.g. 'AV BS CG'")
+    parser.add_argument('--reflector', default='B', type=str.upper,
+                        choices=sorted(MaquinaEnigma.REFLECTORES), help="reflector (default B)")
+    parser.add_argument('--offset', type=_no_negativo, default=0, help="skip this many letters of the key stream")
+    parser.add_argument('--in-place', action='store_true', help="overwrite the input file")
+    parser.add_argument('--text', help="encrypt this text and print it instead of a file")
+    args = parser.parse_args(argv)
+
+    anillos = args.rings.upper()
+    try:
+        # Invalid JSON is a ValueError too
+        rotores = parse_rotors(args.rotors)
+        posiciones = (args.pos or 'A' * len(rotores)).upper()
+        if ',' in anillos:
+            anillos = [int(a) for a in anillos.split(',')]
+        maquina = MaquinaEnigma(rotores, posiciones, anillos=anillos,
+                                clavijas=args.plugboard, reflector=args.reflector)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.offset:
+        maquina.seek(args.offset)
+
+    if args.text is not None:
+        print(maquina.cifrar_mensaje(args.text))
+        return 0
+    if args.input is None:
+        parser.error("an input file, - or --text is required")
+
+    if args.input == '-' or args.output == '-':
+        origen = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+        destino = sys.stdout.buffer if args.output in (None, '-') else open(args.output, 'wb')
+        try:
+            copiar(maquina, origen, destino, BLOQUE)
+        finally:
+            destino.flush()
+            for f in (origen, destino):
+                if f not in (sys.stdin.buffer, sys.stdout.buffer):
+                    f.close()
+        return 0
+
+    if args.in_place == bool(args.output):
+        parser.error("give either -o OUTPUT or --in-place")
+    try:
+        cifrar_archivo(maquina, args.input, None if args.in_place else args.output)
+    except OSError as e:
+        print("Error: {}".format(e), file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,186 @@
+"""
+Low-allocation Enigma engine for MicroPython (ESP32)
+
+Same machine as enigma.MaquinaEnigma (ring settings, plugboard, reflectors,
+double stepping), built for the microcontroller: all tables and the rotor
+positions live in one bytearray, and the letter loop is a
+@micropython.viper function working on raw byte pointers. Encrypting does
+not touch the heap:
+
+    maquina = MaquinaEnigmaMCU(['I', 'II', 'III'], 'ABC')
+    maquina.cifrar_byte(ord('H'))        # -> int, no allocation
+    maquina.cifrar_bytes(datos, salida)  # in place into a caller buffer
+    maquina.cifrar_letra('H')            # -> str from a fixed table
+
+so long messages no longer leave garbage behind for the GC to stall the
+LCD and radio with. On CPython the decorators and ptr8 are stand-ins, so
+the same code (slowly) checks the test vectors on a PC.
+"""
+
+from enigma import MaquinaEnigma, pasos_rotores
+
+try:
+    import micropython
+    from micropython import const
+except ImportError:
+    # CPython
+    class micropython:
+        @staticmethod
+        def native(funcion):
+            return funcion
+
+        viper = native
+
+    def const(valor):
+        return valor
+
+    def ptr8(buf):
+        return buf
+
+# Layout of the state bytearray
+_ENTRADA = const(0)       # 256: byte -> letter index after the plugboard, 255 = not a letter
+_SALIDA = const(256)      # 26: letter index -> ASCII code after the plugboard
+_REFLECTOR = const(282)   # 26
+_MOD = const(308)         # 52: i -> i % 26
+_POS = const(360)         # 5: rotor positions, leftmost first
+_NOTCH = const(365)       # 5
+_NROT = const(370)        # 1: number of rotors
+_ROTORES = const(371)     # 104 per rotor: forward and backward wiring, each doubled
+_TAM_ROTOR = const(104)
+_ATRAS = const(52)
+_TAM_ESTADO = const(891)  # _ROTORES + 5 * _TAM_ROTOR
+
+# One-character strings for cifrar_letra, created once
+_CARACTERES = tuple(chr(i) for i in range(128))
+
+
+@micropython.viper
+def _cifrar(estado, datos, salida, n: int) -> int:
+    """Encrypts n bytes of datos into salida; returns the letters encrypted"""
+    e = ptr8(estado)
+    d = ptr8(datos)
+    s = ptr8(salida)
+    derecha = int(e[_NROT]) - 1
+    letras = 0
+    k = 0
+    while k < n:
+        c = int(d[k])
+        indice = int(e[_ENTRADA + c])
+        if indice == 255:
+            s[k] = c
+            k += 1
+            continue
+        letras += 1
+
+        # Stepping: the pawl left of each rotor engages on its notch and
+        # moves both neighbours (see enigma._paso)
+        p = int(e[_POS + derecha])
+        arrastre = 0
+        if p == int(e[_NOTCH + derecha]):
+            arrastre = 1
+        e[_POS + derecha] = int(e[_MOD + p + 1])
+        j = derecha - 1
+        while j >= 0:
+            p = int(e[_POS + j])
+            en_notch = 0
+            if j > 0 and p == int(e[_NOTCH + j]):
+                en_notch = 1
+            if arrastre or en_notch:
+                e[_POS + j] = int(e[_MOD + p + 1])
+            arrastre = en_notch
+            j -= 1
+
+        j = derecha
+        while j >= 0:
+            p = int(e[_POS + j])
+            indice = int(e[_MOD + 26 - p + int(e[_ROTORES + j * _TAM_ROTOR + indice + p])])
+            j -= 1
+        indice = int(e[_REFLECTOR + indice])
+        j = 0
+        while j <= derecha:
+            p = int(e[_POS + j])
+            indice = int(e[_MOD + 26 - p + int(e[_ROTORES + j * _TAM_ROTOR + _ATRAS + indice + p])])
+            j += 1
+        s[k] = e[_SALIDA + indice]
+        k += 1
+    return letras
+
+
+class MaquinaEnigmaMCU:
+    """MaquinaEnigma with its state in a bytearray and a viper letter loop"""
+
+    def __init__(self, seleccion_rotores, posiciones_iniciales='AAA', anillos=None,
+                 clavijas=None, reflector='B'):
+        # Validation and the folding of rings and plugboard are shared
+        # with enigma.py; only the tables are kept
+        maquina = MaquinaEnigma(seleccion_rotores, posiciones_iniciales,
+                                anillos=anillos, clavijas=clavijas, reflector=reflector)
+        estado = bytearray(_TAM_ESTADO)
+        estado[_ENTRADA:_ENTRADA + 256] = maquina.entrada
+        estado[_SALIDA:_SALIDA + 26] = maquina.salida
+        estado[_REFLECTOR:_REFLECTOR + 26] = maquina.reflector.tabla
+        for i in range(52):
+            estado[_MOD + i] = i % 26
+        estado[_NROT] = len(maquina.rotores)
+        for j, rotor in enumerate(maquina.rotores):
+            estado[_POS + j] = rotor.posicion
+            estado[_NOTCH + j] = rotor.indice_notch
+            base = _ROTORES + j * _TAM_ROTOR
+            estado[base:base + 52] = rotor.adelante * 2
+            estado[base + _ATRAS:base + _ATRAS + 52] = rotor.atras * 2
+        self.estado = estado
+        self.rotores = [r.numero for r in maquina.rotores]
+        self.notches = [r.indice_notch for r in maquina.rotores]
+        self.posiciones_iniciales = [r.posicion for r in maquina.rotores]
+        self.pulsaciones = 0
+        self._uno = bytearray(1)
+
+    @micropython.native
+    def cifrar_byte(self, c):
+        """Encrypts one ASCII code; returns the output code"""
+        uno = self._uno
+        uno[0] = c
+        self.pulsaciones += _cifrar(self.estado, uno, uno, 1)
+        return uno[0]
+
+    def cifrar_letra(self, letra):
+        """Encrypts a single character (non-letters come back unchanged)"""
+        c = ord(letra)
+        if c > 127:
+            return letra
+        return _CARACTERES[self.cifrar_byte(c)]
+
+    def cifrar_bytes(self, datos, salida=None):
+        """Encrypts a bytes-like message; into `salida` (may be `datos`) when given"""
+        n = len(datos)
+        if salida is None:
+            salida = bytearray(n)
+        elif len(salida) < n:
+            raise ValueError("Output buffer too small")
+        self.pulsaciones += _cifrar(self.estado, datos, salida, n)
+        return salida
+
+    def cifrar_mensaje(self, mensaje):
+        """Encrypts a complete message"""
+        return self.cifrar_bytes(mensaje.encode('utf-8')).decode('utf-8')
+
+    def posiciones(self):
+        """Current rotor window letters"""
+        return ''.join(chr(65 + self.estado[_POS + j]) for j in range(len(self.rotores)))
+
+    def reset(self):
+        """Returns the rotors to their initial positions"""
+        self.seek(0)
+
+    def tell(self):
+        """Number of key presses (letters) since the initial positions"""
+        return self.pulsaciones
+
+    def seek(self, n):
+        """Sets the rotors to their state after n key presses"""
+        if n < 0:
+            raise ValueError("Offset must be >= 0")
+        pasos = pasos_rotores(self.posiciones_iniciales, self.notches, n)
+        for j, (inicial, k) in enumerate(zip(self.posiciones_iniciales, pasos)):
+            self.estado[_POS + j] = (inicial + k) % 26
+        self.pulsaciones = n
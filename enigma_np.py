@@ -0,0 +1,90 @@
+"""
+Optional NumPy backend for bulk Enigma processing (host side)
+
+The stepping sequence is deterministic, so the rotor offsets for every
+letter of a message are computed up front as an array and the whole
+forward -> reflector -> backward path becomes a handful of vectorized
+table lookups. Without NumPy (e.g. on MicroPython) every entry point falls
+back to MaquinaEnigma.cifrar_bytes and gives the same output.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from enigma import pasos_rotores
+
+# Letters processed per vectorized pass, keeps temporaries bounded on huge inputs
+BLOQUE = 1 << 20
+
+DISPONIBLE = np is not None
+
+
+def offsets(maquina, n):
+    """Rotor positions for each of the next n key presses, shape (n, rotors).
+
+    Row t holds the positions used to encrypt the (t+1)-th letter, i.e.
+    after the stepping of that key press. The machine is not modified.
+    """
+    rotores = maquina.rotores
+    posiciones = [r.posicion for r in rotores]
+    notches = [r.indice_notch for r in rotores]
+    pulsaciones = np.arange(1, n + 1, dtype=np.int64)
+    # The closed-form step counts work element-wise on the whole array
+    pasos = pasos_rotores(posiciones, notches, pulsaciones, np.maximum)
+    resultado = np.empty((n, len(rotores)), dtype=np.int64)
+    for j, (p, k) in enumerate(zip(posiciones, pasos)):
+        resultado[:, j] = (p + k) % 26
+    return resultado
+
+
+def _cifrar_indices(maquina, indices):
+    """Encrypts an array of letter indices and advances the machine"""
+    n = len(indices)
+    pos = offsets(maquina, n)
+    rotores = maquina.rotores
+    clavijas = np.frombuffer(maquina.clavijas, dtype=np.uint8).astype(np.int64)
+    x = clavijas[indices]
+
+    for j in range(len(rotores) - 1, -1, -1):
+        tabla = np.frombuffer(rotores[j].adelante, dtype=np.uint8).astype(np.int64)
+        p = pos[:, j]
+        x = (tabla[(x + p) % 26] - p) % 26
+
+    x = np.frombuffer(maquina.reflector.tabla, dtype=np.uint8).astype(np.int64)[x]
+
+    for j in range(len(rotores)):
+        tabla = np.frombuffer(rotores[j].atras, dtype=np.uint8).astype(np.int64)
+        p = pos[:, j]
+        x = (tabla[(x + p) % 26] - p) % 26
+
+    if n:
+        for rotor, p in zip(rotores, pos[-1]):
+            rotor.posicion = int(p)
+        maquina.pulsaciones += n
+    return clavijas[x]
+
+
+def cifrar_bytes(maquina, datos):
+    """Vectorized counterpart of MaquinaEnigma.cifrar_bytes, returns a bytearray"""
+    if np is None:
+        return maquina.cifrar_bytes(datos)
+
+    entrada = np.frombuffer(bytes(datos), dtype=np.uint8)
+    salida = entrada.copy()
+    for inicio in range(0, len(entrada), BLOQUE):
+        trozo = entrada[inicio:inicio + BLOQUE]
+        indices = (trozo | 0x20).astype(np.int16) - 97
+        letras = np.flatnonzero((indices >= 0) & (indices <= 25))
+        if len(letras):
+            cifrado = _cifrar_indices(maquina, indices[letras])
+            salida[inicio + letras] = cifrado + 65
+    return bytearray(salida.tobytes())
+
+
+def cifrar_mensaje(maquina, mensaje):
+    """Vectorized counterpart of MaquinaEnigma.cifrar_mensaje"""
+    if np is None:
+        return maquina.cifrar_mensaje(mensaje)
+    return cifrar_bytes(maquina, mensaje.encode('utf-8')).decode('utf-8')
@@ -0,0 +1,74 @@
+"""
+Parallel chunked Enigma processing on a PC (host side only)
+
+The rotor state after any number of key presses is known in closed form
+(MaquinaEnigma.seek), so a long message is cut into chunks and every worker
+process starts its own machine at the letter offset of its chunk. Only
+letters step the rotors, so offsets are letter counts, not byte counts.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from enigma import MaquinaEnigma
+
+LETRAS = bytes(range(65, 91)) + bytes(range(97, 123))
+
+# Below this many bytes per worker the pool costs more than it saves
+MIN_CHUNK = 64 * 1024
+
+
+def count_letters(data):
+    """Number of bytes in `data` that step the rotors"""
+    return len(data) - len(bytes(data).translate(None, LETRAS))
+
+
+def _work(args):
+    rotors, positions, key, offset, chunk = args
+    enigma = MaquinaEnigma(rotors, positions, **key)
+    enigma.seek(offset)
+    return bytes(enigma.cifrar_bytes(chunk))
+
+
+def split(data, chunks):
+    """Splits `data` into about `chunks` pieces, returns (letter_offset, piece) pairs"""
+    size = max(1, -(-len(data) // max(1, chunks)))
+    pieces = []
+    offset = 0
+    for start in range(0, len(data), size):
+        piece = data[start:start + size]
+        pieces.append((offset, piece))
+        offset += count_letters(piece)
+    return pieces
+
+
+def decrypt_parallel(ciphertext, rotors, positions, workers=None, executor=None,
+                     rings=None, plugboard=None, reflector='B'):
+    """Decrypts (or encrypts, Enigma is symmetric) a message on several cores.
+
+    `ciphertext` is a str or bytes-like object and the result has the same
+    type. `rotors`/`positions` use the ESP-NOW packet format, e.g.
+    ['I', 'II', 'III'] and 'ABC'; `rings`, `plugboard` and `reflector` are
+    MaquinaEnigma's anillos/clavijas/reflector. The output is identical to a
+    single MaquinaEnigma(...).cifrar_mensaje(ciphertext) call.
+    """
+    is_text = isinstance(ciphertext, str)
+    data = ciphertext.encode('utf-8') if is_text else bytes(ciphertext)
+    key = {'anillos': rings, 'clavijas': plugboard, 'reflector': reflector}
+    # Validate the key here rather than inside every worker
+    MaquinaEnigma(rotors, positions, **key)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(data) < 2 * MIN_CHUNK:
+        output = bytes(MaquinaEnigma(rotors, positions, **key).cifrar_bytes(data))
+    else:
+        # A few chunks per worker keeps the cores busy if some finish early
+        chunks = min(workers * 4, max(1, len(data) // MIN_CHUNK))
+        jobs = [(rotors, positions, key, offset, piece) for offset, piece in split(data, chunks)]
+        if executor is not None:
+            output = b''.join(executor.map(_work, jobs))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                output = b''.join(pool.map(_work, jobs))
+
+    return output.decode('utf-8') if is_text else output
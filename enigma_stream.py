@@ -0,0 +1,130 @@
+"""
+Streaming Enigma encryption for MicroPython and CPython
+
+EnigmaStream wraps a raw stream (file, socket, BytesIO...) and encrypts
+everything read from or written to it, keeping the rotor state between
+chunks. Only letters step the rotors and every other byte passes through,
+so the output does not depend on where the chunks are cut and matches a
+single cifrar_mensaje call over the whole input. Memory use is one chunk
+buffer, whatever the input size.
+"""
+
+try:
+    from io import RawIOBase as _Base
+except ImportError:
+    # MicroPython: plain object with the same method names
+    _Base = object
+
+TAMANO_BLOQUE = 512
+
+
+class EnigmaStream(_Base):
+    """io.RawIOBase-style wrapper: readinto()/read() decrypt, write() encrypts.
+
+    Enigma is symmetric, so both directions apply the same transformation;
+    "encrypt" and "decrypt" only depend on the machine's key.
+
+    close() leaves `raw` open unless `cerrar_raw` (like closefd), so
+    dropping a wrapper never closes the caller's stream.
+    """
+
+    def __init__(self, maquina, raw, tamano_bloque=TAMANO_BLOQUE, cerrar_raw=False):
+        self.maquina = maquina
+        self.raw = raw
+        self.cerrar_raw = cerrar_raw
+        self._bloque = bytearray(tamano_bloque)
+
+    def readable(self):
+        return hasattr(self.raw, 'readinto') or hasattr(self.raw, 'read')
+
+    def writable(self):
+        return hasattr(self.raw, 'write')
+
+    def readinto(self, b):
+        """Reads from the raw stream into b and transforms it in place"""
+        vista = memoryview(b)
+        if hasattr(self.raw, 'readinto'):
+            n = self.raw.readinto(vista)
+        else:
+            datos = self.raw.read(len(vista))
+            n = len(datos) if datos else 0
+            vista[:n] = datos or b''
+        if n:
+            self.maquina.cifrar_bytes(vista[:n], vista[:n])
+        return n
+
+    def read(self, n=-1):
+        if n is None or n < 0:
+            partes = []
+            while True:
+                parte = self.read(len(self._bloque))
+                if not parte:
+                    return b''.join(partes)
+                partes.append(parte)
+        b = bytearray(n)
+        n = self.readinto(b)
+        return bytes(b[:n]) if n else b''
+
+    def write(self, b):
+        """Transforms b through the chunk buffer and writes it to the raw stream"""
+        vista = memoryview(b)
+        bloque = self._bloque
+        salida = memoryview(bloque)
+        tamano = len(bloque)
+        for inicio in range(0, len(vista), tamano):
+            trozo = vista[inicio:inicio + tamano]
+            self.maquina.cifrar_bytes(trozo, bloque)
+            self.raw.write(salida[:len(trozo)])
+        return len(vista)
+
+    def flush(self):
+        raw = self.raw
+        if hasattr(raw, 'flush') and not getattr(raw, 'closed', False):
+            raw.flush()
+
+    def close(self):
+        if self.raw is not None and self.cerrar_raw:
+            self.raw.close()
+            self.raw = None
+        if _Base is not object:
+            _Base.close(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def cifrar_flujo(maquina, bloques):
+    """Generator pipeline stage: yields each str/bytes chunk transformed.
+
+    str chunks come back as str, bytes-like chunks as bytes.
+    """
+    for bloque in bloques:
+        if isinstance(bloque, str):
+            yield maquina.cifrar_mensaje(bloque)
+        else:
+            yield bytes(maquina.cifrar_bytes(bloque))
+
+
+def copiar(maquina, origen, destino, tamano_bloque=TAMANO_BLOQUE):
+    """Transforms everything from `origen` into `destino` with one reused buffer.
+
+    Returns the number of bytes copied.
+    """
+    bloque = bytearray(tamano_bloque)
+    vista = memoryview(bloque)
+    total = 0
+    while True:
+        if hasattr(origen, 'readinto'):
+            n = origen.readinto(bloque)
+        else:
+            datos = origen.read(tamano_bloque)
+            n = len(datos) if datos else 0
+            vista[:n] = datos or b''
+        if not n:
+            return total
+        maquina.cifrar_bytes(vista[:n], vista[:n])
+        destino.write(vista[:n])
+        total += n
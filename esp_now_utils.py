@@ -1,6 +1,186 @@
 import network
 import espnow
 import json
+import random
+
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:
+    # CPython
+    import time
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+    def ticks_diff(a, b):
+        return a - b
+
+# --- BINARY PACKET FORMAT ---
+# Big-endian, 11-byte header followed by the ciphertext:
+#   0  u8   0xE0 | version (JSON packets always start with '{')
+#   1  u16  sequence number
+#   3  u8   number of rotors (3-5)
+#   4  3B   rotor ids, one nibble each (1=I ... 5=V), first rotor in the high nibble
+#   7  u32  start positions, 5 bits each (A=0), first rotor in the top bits
+#  11  ...  ciphertext bytes
+PACKET_VERSION = 1
+PACKET_MAGIC = 0xE0 | PACKET_VERSION
+HEADER_SIZE = 11
+MAX_PAYLOAD = 250  # ESP-NOW frame limit
+ROTOR_IDS = ('I', 'II', 'III', 'IV', 'V')
+
+# --- FRAGMENTS ---
+# Packets longer than one frame are sent as numbered fragments:
+#   0  u8   0xD0 | version
+#   1  u16  message id (the packet's sequence number)
+#   3  u8   fragment index
+#   4  u8   fragment count
+#   5  ...  up to FRAG_PAYLOAD bytes of the packet
+FRAG_MAGIC = 0xD0 | PACKET_VERSION
+FRAG_HEADER_SIZE = 5
+FRAG_PAYLOAD = MAX_PAYLOAD - FRAG_HEADER_SIZE
+MAX_FRAGMENTS = 16
+MAX_MESSAGE = MAX_FRAGMENTS * FRAG_PAYLOAD
+REASSEMBLY_SLOTS = 2
+REASSEMBLY_TIMEOUT_MS = 2000  # longer than the largest retransmit backoff
+# Driver receive buffer, large enough for a full burst of fragments
+RX_BUFFER = MAX_FRAGMENTS * (MAX_PAYLOAD + 16)
+
+# --- ACKNOWLEDGEMENTS ---
+# Bob acknowledges every packet/fragment it receives:
+#   0  u8   0xA0 | version
+#   1  u16  message id
+#   3  u8   fragment index (0 for unfragmented packets)
+ACK_MAGIC = 0xA0 | PACKET_VERSION
+ACK_SIZE = 4
+ACK_WINDOW = 4        # frames in flight before waiting for ACKs
+ACK_TIMEOUT_MS = 50   # first retransmit timeout, doubled on every retry
+ACK_POLL_MS = 10
+MAX_RETRIES = 5
+DUP_HISTORY = 16      # recent (sender, message id) pairs remembered by Bob
+
+def encode_packet(buf, seq, rotors, positions, text):
+    """Packs a message into buf (bytearray/memoryview). Returns its length.
+
+    `text` should be bytes-like; it is copied straight into buf.
+    """
+    n = len(rotors)
+    size = HEADER_SIZE + len(text)
+    if size > len(buf):
+        raise ValueError("Packet too large: {} bytes".format(size))
+    buf[0] = PACKET_MAGIC
+    buf[1] = (seq >> 8) & 0xFF
+    buf[2] = seq & 0xFF
+    buf[3] = n
+    ids = 0
+    pos = 0
+    for i in range(5):
+        ids <<= 4
+        pos <<= 5
+        if i < n:
+            ids |= ROTOR_IDS.index(rotors[i]) + 1
+            pos |= (ord(positions[i]) & 0xDF) - 65 if i < len(positions) else 0
+    ids <<= 4  # 5 nibbles padded to 3 bytes
+    pos <<= 7  # 25 bits padded to 32
+    for i in range(3):
+        buf[4 + i] = (ids >> (16 - 8 * i)) & 0xFF
+    for i in range(4):
+        buf[7 + i] = (pos >> (24 - 8 * i)) & 0xFF
+    memoryview(buf)[HEADER_SIZE:size] = text
+    return size
+
+def decode_packet(msg):
+    """Unpacks a binary packet. Returns (seq, rotors, positions, text).
+
+    `text` is a memoryview into msg, the ciphertext is not copied.
+    """
+    if len(msg) < HEADER_SIZE or msg[0] != PACKET_MAGIC:
+        raise ValueError("Not a v{} packet".format(PACKET_VERSION))
+    n = msg[3]
+    if not 3 <= n <= 5:
+        raise ValueError("Bad rotor count")
+    seq = (msg[1] << 8) | msg[2]
+    ids = (msg[4] << 16) | (msg[5] << 8) | msg[6]
+    pos = (msg[7] << 24) | (msg[8] << 16) | (msg[9] << 8) | msg[10]
+    rotors = []
+    positions = ''
+    for i in range(n):
+        rotor_id = (ids >> (20 - 4 * i)) & 0x0F
+        if not 1 <= rotor_id <= len(ROTOR_IDS):
+            raise ValueError("Bad rotor id")
+        rotors.append(ROTOR_IDS[rotor_id - 1])
+        positions += chr(65 + ((pos >> (27 - 5 * i)) & 0x1F))
+    return seq, rotors, positions, memoryview(msg)[HEADER_SIZE:]
+
+class Reassembler:
+    """Rebuilds fragmented packets in preallocated buffers.
+
+    Each slot holds one message in progress with a bitmap of the fragments
+    received so far; messages with no new fragment for `timeout_ms` are
+    dropped. A message in progress is never evicted for a new one, whose
+    fragments have to wait (unACKed) until a slot is free.
+    """
+    def __init__(self, slots=REASSEMBLY_SLOTS, timeout_ms=REASSEMBLY_TIMEOUT_MS):
+        self.timeout_ms = timeout_ms
+        self.buffers = [bytearray(MAX_MESSAGE) for _ in range(slots)]
+        self.keys = [None] * slots
+        self.bitmaps = [0] * slots
+        self.sizes = [0] * slots
+        self.last_seen = [0] * slots
+        self.dropped = 0
+        self.refused = 0
+
+    def expire(self, now=None):
+        """Drops messages that have been incomplete for too long"""
+        if now is None:
+            now = ticks_ms()
+        for i, key in enumerate(self.keys):
+            if key is not None and ticks_diff(now, self.last_seen[i]) > self.timeout_ms:
+                self.keys[i] = None
+                self.dropped += 1
+
+    def accepts(self, host, frame):
+        """True if add() has room for this fragment; counts a refusal if not"""
+        self.expire()
+        key = (bytes(host), (frame[1] << 8) | frame[2])
+        if key in self.keys or None in self.keys:
+            return True
+        self.refused += 1
+        return False
+
+    def add(self, host, frame):
+        """Stores one fragment. Returns a memoryview of the whole packet once
+        the last fragment is in (valid until the next add), else None."""
+        if len(frame) < FRAG_HEADER_SIZE or frame[0] != FRAG_MAGIC:
+            raise ValueError("Not a fragment")
+        index = frame[3]
+        count = frame[4]
+        if count == 0 or count > MAX_FRAGMENTS or index >= count:
+            raise ValueError("Bad fragment header")
+        now = ticks_ms()
+        self.expire(now)
+
+        key = (bytes(host), (frame[1] << 8) | frame[2])
+        if key in self.keys:
+            slot = self.keys.index(key)
+        else:
+            if None not in self.keys:
+                raise ValueError("No reassembly slot free")
+            slot = self.keys.index(None)
+            self.keys[slot] = key
+            self.bitmaps[slot] = 0
+            self.sizes[slot] = 0
+
+        self.last_seen[slot] = now
+        payload = memoryview(frame)[FRAG_HEADER_SIZE:]
+        start = index * FRAG_PAYLOAD
+        self.buffers[slot][start:start + len(payload)] = payload
+        self.bitmaps[slot] |= 1 << index
+        if index == count - 1:
+            self.sizes[slot] = start + len(payload)
+
+        if self.bitmaps[slot] == (1 << count) - 1:
+            self.keys[slot] = None
+            return memoryview(self.buffers[slot])[:self.sizes[slot]]
+        return None
 
 class EspNowLink:
     def __init__(self):
@@ -9,12 +189,56 @@ class EspNowLink:
         # ESP-NOW requires Wi-Fi to be active, but not necessarily connected
         
         self.e = espnow.ESPNow()
+        try:
+            self.e.config(rxbuf=RX_BUFFER)
+        except Exception as e:
+            print(f"Error setting rxbuf: {e}")
         self.e.active(True)
+        
+        self._tx = bytearray(MAX_MESSAGE)
+        self._frame = bytearray(MAX_PAYLOAD)
+        self._ack = bytearray(ACK_SIZE)
+        # Random start so a rebooted sender is not mistaken for duplicates
+        self._seq = random.getrandbits(16)
+        self._macs = {}
+        self._peers = set()
+        self._recent = [None] * DUP_HISTORY
+        self._recent_next = 0
+        self.reassembler = Reassembler()
+        self.retransmits = 0
+        self.duplicates = 0
+        self.channel = None
+
+    def _mac(self, mac_address_str):
+        """MAC string to bytes, parsed once per peer"""
+        mac = self._macs.get(mac_address_str)
+        if mac is None:
+            mac = bytes(int(x, 16) for x in mac_address_str.split(':'))
+            self._macs[mac_address_str] = mac
+        return mac
+
+    def driver_dropped(self):
+        """Frames the driver dropped for want of receive buffer space"""
+        try:
+            return self.e.stats()[4]
+        except (AttributeError, OSError):
+            return 0
 
     def set_channel(self, channel):
-        """Sets the Wi-Fi channel (1-13). Sender and Receiver MUST match."""
+        """Sets the Wi-Fi channel (1-13). Sender and Receiver MUST match.
+
+        While the STA interface is connected to an AP the radio stays on the
+        AP's channel, so a different channel is refused instead of breaking
+        the Wi-Fi link."""
         try:
+            if self.wlan.isconnected():
+                current = self.wlan.config('channel')
+                if channel != current:
+                    print(f"Connected to Wi-Fi on channel {current}, keeping it for ESP-NOW")
+                    self.channel = current
+                    return False
             self.wlan.config(channel=channel)
+            self.channel = channel
             return True
         except Exception as e:
             print(f"Error setting channel: {e}")
@@ -30,6 +254,119 @@ class EspNowLink:
             print(f"Error adding peer: {e}")
             return False
 
+    def send_packet(self, mac_address_str, rotors, positions, text, reliable=True):
+        """Sends a ciphertext with its key settings as a binary packet.
+
+        With `reliable`, waits for Bob's ACKs and retransmits unacknowledged
+        frames with exponential backoff; returns False if they never arrive.
+        """
+        steps = self.send_steps(mac_address_str, rotors, positions, text, reliable, blocking=True)
+        try:
+            while True:
+                next(steps)
+        except StopIteration as e:
+            return e.value
+
+    def send_steps(self, mac_address_str, rotors, positions, text, reliable=True, blocking=False):
+        """send_packet as a generator, for event loops: it yields the number
+        of ms to sleep whenever it is waiting for ACKs, and returns
+        send_packet's result (StopIteration.value)."""
+        try:
+            if isinstance(text, str):
+                text = text.encode()
+            size = encode_packet(self._tx, self._seq, rotors, positions, text)
+            msg_id = self._seq
+            self._seq = (self._seq + 1) & 0xFFFF
+            mac = self._mac(mac_address_str)
+            packet = memoryview(self._tx)[:size]
+            count = (size + FRAG_PAYLOAD - 1) // FRAG_PAYLOAD if size > MAX_PAYLOAD else 1
+            if reliable:
+                return (yield from self._send_reliable(mac, msg_id, packet, count, blocking))
+            for index in range(count):
+                self._send_frame(mac, msg_id, packet, index, count)
+            return True
+        except Exception as e:
+            print(f"Send Error: {e}")
+            return False
+
+    def _send_frame(self, mac, msg_id, packet, index, count):
+        """Sends the whole packet (count == 1) or one numbered fragment of it"""
+        if count == 1:
+            self.e.send(mac, packet)
+            return
+        frame = self._frame
+        view = memoryview(frame)
+        chunk = packet[index * FRAG_PAYLOAD:(index + 1) * FRAG_PAYLOAD]
+        frame[0] = FRAG_MAGIC
+        frame[1] = (msg_id >> 8) & 0xFF
+        frame[2] = msg_id & 0xFF
+        frame[3] = index
+        frame[4] = count
+        view[FRAG_HEADER_SIZE:FRAG_HEADER_SIZE + len(chunk)] = chunk
+        self.e.send(mac, view[:FRAG_HEADER_SIZE + len(chunk)])
+
+    def _send_reliable(self, mac, msg_id, packet, count, blocking):
+        """Sliding window of ACK_WINDOW unacknowledged frames (a generator,
+        see send_steps). `blocking` waits for ACKs in recv() instead of
+        yielding.
+
+        Anything other than our ACKs received meanwhile is discarded.
+        """
+        broadcast = mac == b'\xff\xff\xff\xff\xff\xff'
+        pending = {}  # index -> [sent_at, timeout_ms, retries]
+        next_index = 0
+        while next_index < count or pending:
+            while next_index < count and len(pending) < ACK_WINDOW:
+                self._send_frame(mac, msg_id, packet, next_index, count)
+                pending[next_index] = [ticks_ms(), ACK_TIMEOUT_MS, 0]
+                next_index += 1
+
+            host, msg = self.e.recv(ACK_POLL_MS if blocking else 0)
+            if not msg and not blocking:
+                yield ACK_POLL_MS
+            if (msg and len(msg) >= ACK_SIZE and msg[0] == ACK_MAGIC
+                    and ((msg[1] << 8) | msg[2]) == msg_id
+                    and (broadcast or host == mac)):
+                pending.pop(msg[3], None)
+
+            now = ticks_ms()
+            for index, state in pending.items():
+                if ticks_diff(now, state[0]) >= state[1]:
+                    if state[2] >= MAX_RETRIES:
+                        print(f"No ACK for message {msg_id}")
+                        return False
+                    self._send_frame(mac, msg_id, packet, index, count)
+                    self.retransmits += 1
+                    state[0] = now
+                    state[1] *= 2
+                    state[2] += 1
+        return True
+
+    def _send_ack(self, host, msg_id, index):
+        if host not in self._peers:
+            try:
+                self.e.add_peer(host)
+            except OSError:
+                pass  # already registered
+            self._peers.add(bytes(host))
+        ack = self._ack
+        ack[0] = ACK_MAGIC
+        ack[1] = (msg_id >> 8) & 0xFF
+        ack[2] = msg_id & 0xFF
+        ack[3] = index
+        try:
+            self.e.send(host, ack, False)
+        except OSError as e:
+            print(f"ACK Error: {e}")
+
+    def _is_duplicate(self, key):
+        return key in self._recent
+
+    def _remember(self, key):
+        """Records a delivered message in the duplicate ring buffer"""
+        self._recent[self._recent_next] = key
+        self._recent_next = (self._recent_next + 1) % DUP_HISTORY
+
     def send_json(self, mac_address_str, data_dict):
         """Sends a dictionary as a JSON string to the target MAC"""
         try:
@@ -41,17 +378,115 @@ class EspNowLink:
             print(f"Send Error: {e}")
             return False
 
-    def receive_json(self):
-        """Checks for incoming messages. Returns (mac, data_dict) or None."""
-        host, msg = self.e.recv(0) # 0 timeout = non-blocking
+    def receive_json(self, timeout_ms=0):
+        """Checks for incoming messages. Returns (mac, data_dict) or None.
+
+        `timeout_ms`: 0 returns at once, > 0 blocks up to that long, < 0
+        blocks until a message arrives.
+        Accepts binary packets (whole or fragmented) and legacy JSON packets.
+        Binary frames are acknowledged and retransmitted copies of messages
+        already delivered are dropped. Queued fragments are read until a
+        message completes or the wait is over.
+        """
+        start = ticks_ms()
+        wait = timeout_ms
+        while True:
+            host, msg = self.e.recv(wait)
+            if not msg:
+                self.reassembler.expire()
+                return None
+            result = self._handle_frame(host, msg)
+            if result:
+                return result
+            if timeout_ms > 0:
+                wait = max(0, timeout_ms - ticks_diff(ticks_ms(), start))
+
+    def receive_all(self, timeout_ms=0):
+        """Drains the receive queue in one go. Returns a list of (mac, data_dict).
+
+        Waits like receive_json for the first message, then collects every
+        other message already queued without waiting.
+        """
+        messages = []
+        packet = self.receive_json(timeout_ms)
+        while packet:
+            messages.append(packet)
+            packet = self.receive_json(0)
+        return messages
+
+    def on_receive(self, callback):
+        """IRQ mode: calls callback(mac, data_dict) for every message as the
+        radio delivers it, draining the whole queue per interrupt.
+        Pass None to go back to polling."""
+        if callback is None:
+            self.e.irq(None)
+            return
+
+        def handler(e):
+            for mac, data in self.receive_all(0):
+                callback(mac, data)
+        self.e.irq(handler)
+
+    def notify(self, callback):
+        """Calls callback() from the radio IRQ whenever frames arrive, without
+        reading them (e.g. to wake an asyncio task). Pass None to disable."""
+        if callback is None:
+            self.e.irq(None)
+        else:
+            self.e.irq(lambda e: callback())
+
+    def _handle_frame(self, host, msg):
+        """ACK, duplicate check and reassembly for one received frame.
+        Returns (mac, data_dict) when it completes a message, else None."""
+        kind = msg[0]
+        if kind == ACK_MAGIC:
+            return None  # late ACK, nothing waiting for it
+        if kind == PACKET_MAGIC or kind == FRAG_MAGIC:
+            if len(msg) < FRAG_HEADER_SIZE:
+                print("Received malformed message")
+                return None
+            key = (bytes(host), (msg[1] << 8) | msg[2])
+            duplicate = self._is_duplicate(key)
+            if kind == FRAG_MAGIC and not duplicate and not self.reassembler.accepts(host, msg):
+                # Every slot is busy: no ACK, so the sender retransmits
+                # later, instead of evicting a message whose fragments
+                # were already ACKed
+                return None
+            self._send_ack(host, key[1], msg[3] if kind == FRAG_MAGIC else 0)
+            if duplicate:
+                self.duplicates += 1
+                return None
+            if kind == FRAG_MAGIC:
+                try:
+                    msg = self.reassembler.add(host, msg)
+                except ValueError:
+                    print("Received malformed fragment")
+                    return None
+                if msg is None:
+                    return None
+                if msg[0] != PACKET_MAGIC:
+                    # Only binary packets are ever fragmented
+                    print("Received malformed fragment")
+                    return None
+            self._remember(key)
+        return self._parse(host, msg)
+
+    def _parse(self, host, msg):
+        """Decodes a complete binary or JSON packet. Returns (mac, data_dict) or None."""
         if msg:
             try:
-                data_str = msg.decode()
-                data = json.loads(data_str)
+                if msg[0] == PACKET_MAGIC:
+                    seq, rotors, positions, text = decode_packet(msg)
+                    data = {'seq': seq, 'rotors': rotors, 'pos': positions, 'text': str(text, 'utf-8')}
+                    host_str = ':'.join('{:02x}'.format(x) for x in host)
+                    return host_str, data
+                data = json.loads(str(msg, 'utf-8'))
+                if not isinstance(data, dict):
+                    raise ValueError("Not a JSON object")
                 # Convert host bytes to hex string
                 host_str = ':'.join('{:02x}'.format(x) for x in host)
                 return host_str, data
             except ValueError:
-                print("Received non-JSON message")
+                print("Received malformed message")
                 return None
         return None
@@ -0,0 +1,186 @@
+"""
+Linux stand-ins for the ESP32 hardware modules (CPython)
+
+install() registers CPython back ends under the MicroPython module names,
+so main_sender.py, main_receiver.py and everything they import run
+unchanged on a PC:
+
+    machine   Pin, and I2C buses that are mock_i2c.MockI2C (emulated LCD)
+    network   WLAN joining a simulated access point
+    espnow    fake_espnow: in this process, or over localhost UDP
+    uselect   CPython's select (poll() on stdin)
+    Telegram  telegram_standin, with telegram_bot pointed at it
+
+    board = fake_board.install()
+    import main_receiver           # after install()
+    board.buses[0].lcd.lines()     # what the LCD shows
+    board.telegram.messages        # what reached "Telegram"
+
+From two terminals, Alice and Bob talk over UDP:
+
+    python fake_board.py receiver
+    python fake_board.py sender
+"""
+
+import io
+import select
+import sys
+import types
+
+import fake_espnow
+import telegram_standin
+from mock_i2c import MockI2C
+
+BOB_MAC = b'\x02\x00\x00\x00\x00\xbb'
+ALICE_MAC = b'\x02\x00\x00\x00\x00\xaa'
+AP_CHANNEL = 6
+AP_BSSID = b'\x02\xa9\x00\x00\x00\x01'
+
+# ESP32 port status codes
+STAT_IDLE = 1000
+STAT_CONNECTING = 1001
+STAT_GOT_IP = 1010
+STAT_NO_AP_FOUND = 201
+STAT_WRONG_PASSWORD = 202
+
+
+class Pin:
+    """machine.Pin without the hardware"""
+    IN = 1
+    OUT = 3
+    PULL_UP = 2
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self._value = value or 0
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = value
+
+
+class WLAN(fake_espnow.WLAN):
+    """Station interface joining the board's simulated access point"""
+
+    def __init__(self, board, interface=0):
+        fake_espnow.WLAN.__init__(self, interface)
+        self.board = board
+        self._connected = False
+        self._status = STAT_IDLE
+
+    def connect(self, ssid, password=None, bssid=None):
+        board = self.board
+        if board.ssid is not None and ssid != board.ssid:
+            self._status = STAT_NO_AP_FOUND
+        elif board.password is not None and password != board.password:
+            self._status = STAT_WRONG_PASSWORD
+        else:
+            self._connected = True
+            self._status = STAT_GOT_IP
+            self._channel = board.channel
+
+    def config(self, *args, **kwargs):
+        if args == ('bssid',):
+            return AP_BSSID if self._connected else None
+        return fake_espnow.WLAN.config(self, *args, **kwargs)
+
+    def disconnect(self):
+        self._connected = False
+        self._status = STAT_IDLE
+
+    def isconnected(self):
+        return self._connected
+
+    def status(self):
+        return self._status
+
+    def scan(self):
+        if self.board.ssid is None:
+            return []
+        return [(self.board.ssid.encode(), AP_BSSID, self.board.channel, -50, 3, False)]
+
+    def ifconfig(self):
+        return ('192.168.4.2', '255.255.255.0', '192.168.4.1', '192.168.4.1')
+
+
+class Board:
+    """The simulated hardware: radio air, I2C buses, access point and Telegram"""
+
+    def __init__(self, air, telegram=None, ssid=None, password=None, channel=AP_CHANNEL):
+        self.air = air
+        self.telegram = telegram
+        self.ssid = ssid            # None: the AP accepts any SSID
+        self.password = password
+        self.channel = channel
+        self.buses = []
+        self._interfaces = {}
+
+    def I2C(self, id=0, scl=None, sda=None, freq=400000):
+        bus = MockI2C(freq=freq)
+        self.buses.append(bus)
+        return bus
+
+    def WLAN(self, interface=0):
+        # One object per interface, as on the ESP32
+        wlan = self._interfaces.get(interface)
+        if wlan is None:
+            wlan = self._interfaces[interface] = WLAN(self, interface)
+        return wlan
+
+    def modules(self):
+        machine = types.ModuleType('machine')
+        machine.Pin = Pin
+        machine.I2C = self.I2C
+        network = types.ModuleType('network')
+        network.STA_IF = 0
+        network.AP_IF = 1
+        network.WLAN = self.WLAN
+        for name, value in globals().items():
+            if name.startswith('STAT_'):
+                setattr(network, name, value)
+        return {'machine': machine, 'network': network, 'uselect': select}
+
+
+def serial_stdin():
+    """A sys.stdin that reads one byte at a time, so poll() sees every
+    pending character (a buffered stdin swallows the rest of the line)"""
+    stream = io.TextIOWrapper(io.FileIO(sys.stdin.fileno(), 'r', closefd=False), encoding='utf-8')
+    stream._CHUNK_SIZE = 1
+    return stream
+
+
+def install(loss=0.0, latency_ms=0, jitter_ms=0, seed=None, udp_port=None,
+            telegram=True, ssid=None, password=None):
+    """Registers the stand-in modules and returns the Board.
+
+    Must run before main_*, telegram_bot, wifi_manager or esp_now_utils
+    are imported. `telegram=False` leaves the real Bot API in place.
+    """
+    board = Board(None, ssid=ssid, password=password)
+    sys.modules.update(board.modules())
+    board.air = fake_espnow.install(loss, latency_ms, jitter_ms, seed, udp_port)
+    if telegram:
+        import telegram_bot
+        board.telegram = telegram_standin.start()
+        telegram_bot.TELEGRAM_HOST = '127.0.0.1'
+        telegram_bot.TELEGRAM_PORT = board.telegram.port
+        telegram_bot.TELEGRAM_TLS = False
+    return board
+
+
+if __name__ == '__main__':
+    role = sys.argv[1] if len(sys.argv) > 1 else ''
+    if role not in ('sender', 'receiver'):
+        sys.exit("usage: python fake_board.py sender|receiver")
+    install(udp_port=fake_espnow.UDP_BASE_PORT)
+    sys.stdin = serial_stdin()
+    if role == 'receiver':
+        fake_espnow.set_mac(BOB_MAC)
+        import main_receiver
+        main_receiver.main()
+    else:
+        fake_espnow.set_mac(ALICE_MAC)
+        import main_sender
+        main_sender.TARGET_MAC = ':'.join('{:02X}'.format(b) for b in BOB_MAC)
+        main_sender.main()
@@ -0,0 +1,286 @@
+"""
+Loopback stand-in for MicroPython's `espnow` (and a minimal `network`)
+
+Lets EspNowLink and the Alice/Bob protocol run on a PC. Every ESPNow
+instance is a station on a shared simulated Air, which can drop frames
+and add latency:
+
+    import fake_espnow
+    air = fake_espnow.install(loss=0.2, latency_ms=5)
+    fake_espnow.set_mac(b'\\x02\\x00\\x00\\x00\\x00\\x01')
+    from esp_now_utils import EspNowLink
+    bob = EspNowLink()
+
+Stations are thread-safe, so a sender and a receiver can run in two
+threads of the same process. With install(udp_port=...) the Air is UDP on
+localhost instead, so Alice and Bob can also run as separate processes.
+"""
+
+import random
+import socket
+import sys
+import threading
+import time
+import types
+
+BROADCAST = b'\xff' * 6
+MAX_DATA_LEN = 250
+UDP_BASE_PORT = 47000
+
+_next_mac = None
+_counter = 0
+
+
+class Air:
+    """Shared medium connecting all fake ESPNow stations"""
+
+    def __init__(self, loss=0.0, latency_ms=0, jitter_ms=0, seed=None):
+        self.loss = loss
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.stations = {}
+        self.sent = 0
+        self.lost = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def attach(self, station):
+        with self._lock:
+            self.stations[station.mac] = station
+
+    def transmit(self, src, dst, msg):
+        """Delivers msg to dst (or everyone for broadcast) unless it is lost"""
+        with self._lock:
+            self.sent += 1
+            if self.loss and self._random.random() < self.loss:
+                self.lost += 1
+                return
+            delay = self._delay()
+            if dst == BROADCAST:
+                targets = [s for m, s in self.stations.items() if m != src]
+            else:
+                targets = [self.stations[dst]] if dst in self.stations else []
+        due = time.monotonic() + delay
+        for station in targets:
+            station._deliver(due, src, msg)
+
+    def _delay(self):
+        """Seconds a frame spends on the air (call with the lock held)"""
+        return (self.latency_ms + (self._random.random() * self.jitter_ms if self.jitter_ms else 0)) / 1000
+
+
+class UdpAir(Air):
+    """Air shared between processes: every station listens on the localhost
+    UDP port base_port + last MAC byte, and a frame is one datagram with the
+    source MAC in front. Loss is applied by the sender, latency by the
+    receiver; broadcasts go to every port in the range."""
+
+    def __init__(self, base_port=UDP_BASE_PORT, loss=0.0, latency_ms=0, jitter_ms=0, seed=None):
+        Air.__init__(self, loss, latency_ms, jitter_ms, seed)
+        self.base_port = base_port
+        self._out = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _port(self, mac):
+        return self.base_port + mac[5]
+
+    def attach(self, station):
+        Air.attach(self, station)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('127.0.0.1', self._port(station.mac)))
+        threading.Thread(target=self._listen, args=(sock, station), daemon=True).start()
+
+    def _listen(self, sock, station):
+        while True:
+            frame = sock.recv(6 + MAX_DATA_LEN)
+            with self._lock:
+                delay = self._delay()
+            station._deliver(time.monotonic() + delay, frame[:6], frame[6:])
+
+    def transmit(self, src, dst, msg):
+        with self._lock:
+            self.sent += 1
+            if self.loss and self._random.random() < self.loss:
+                self.lost += 1
+                return
+        if dst == BROADCAST:
+            ports = range(self.base_port, self.base_port + 256)
+        else:
+            ports = (self._port(dst),)
+        for port in ports:
+            if port != self._port(src):
+                try:
+                    self._out.sendto(src + msg, ('127.0.0.1', port))
+                except OSError:
+                    pass
+
+
+class ESPNow:
+    """Subset of the MicroPython espnow.ESPNow API"""
+
+    def __init__(self):
+        self.mac = take_mac()
+        self.air = air
+        self.peers = set()
+        self.rxbuf = 526
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+        self._active = False
+        self._queue = []
+        self._queued_bytes = 0
+        self._irq = None
+        self._cond = threading.Condition()
+        air.attach(self)
+
+    def active(self, flag=None):
+        if flag is not None:
+            self._active = bool(flag)
+        return self._active
+
+    def config(self, rxbuf=None, timeout_ms=None, **kwargs):
+        if rxbuf is not None:
+            self.rxbuf = rxbuf
+
+    def add_peer(self, mac, *args, **kwargs):
+        mac = bytes(mac)
+        if mac in self.peers:
+            raise OSError("ESP_ERR_ESPNOW_EXIST")
+        self.peers.add(mac)
+
+    def send(self, mac, msg, sync=True):
+        if not self._active:
+            raise OSError("ESP_ERR_ESPNOW_NOT_INIT")
+        mac = bytes(mac)
+        if mac != BROADCAST and mac not in self.peers:
+            raise OSError("ESP_ERR_ESPNOW_NOT_FOUND")
+        if isinstance(msg, str):
+            msg = msg.encode()
+        msg = bytes(msg)
+        if len(msg) > MAX_DATA_LEN:
+            raise ValueError("ESP_ERR_ESPNOW_ARG")
+        self.sent += 1
+        self.air.transmit(self.mac, mac, msg)
+        return True
+
+    def _deliver(self, due, src, msg):
+        with self._cond:
+            # The driver drops frames that do not fit in its receive buffer
+            if self._queued_bytes + len(msg) > self.rxbuf:
+                self.dropped += 1
+                return
+            self.received += 1
+            self._queue.append((due, src, msg))
+            self._queued_bytes += len(msg)
+            self._cond.notify_all()
+        if self._irq:
+            # As on the board, the IRQ fires once the frame has arrived
+            delay = due - time.monotonic()
+            if delay > 0:
+                timer = threading.Timer(delay, self._fire_irq)
+                timer.daemon = True
+                timer.start()
+            else:
+                self._irq(self)
+
+    def _fire_irq(self):
+        irq = self._irq
+        if irq:
+            irq(self)
+
+    def _pop_ready(self):
+        if self._queue and self._queue[0][0] <= time.monotonic():
+            _, src, msg = self._queue.pop(0)
+            self._queued_bytes -= len(msg)
+            return src, msg
+        return None
+
+    def recv(self, timeout_ms=None):
+        """Returns (mac, msg), or (None, None) after timeout_ms (<0 waits forever)"""
+        deadline = None if timeout_ms is None or timeout_ms < 0 else time.monotonic() + timeout_ms / 1000
+        with self._cond:
+            while True:
+                item = self._pop_ready()
+                if item:
+                    return item
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    return None, None
+                wait = None if deadline is None else deadline - now
+                if self._queue:
+                    due = self._queue[0][0] - now
+                    wait = due if wait is None else min(wait, due)
+                self._cond.wait(wait)
+
+    def stats(self):
+        """(tx_pkts, tx_responses, tx_failures, rx_packets, rx_dropped_packets)"""
+        return self.sent, self.sent, 0, self.received, self.dropped
+
+    def any(self):
+        with self._cond:
+            return bool(self._queue) and self._queue[0][0] <= time.monotonic()
+
+    def irq(self, callback):
+        self._irq = callback
+
+
+class WLAN:
+    """Minimal network.WLAN: enough for EspNowLink"""
+
+    def __init__(self, interface=0):
+        self._active = False
+        self._channel = 1
+
+    def active(self, flag=None):
+        if flag is not None:
+            self._active = bool(flag)
+        return self._active
+
+    def config(self, *args, **kwargs):
+        if 'channel' in kwargs:
+            self._channel = kwargs['channel']
+        if args == ('channel',):
+            return self._channel
+        if args == ('mac',):
+            return _next_mac or b'\x02\x00\x00\x00\x00\x00'
+
+    def isconnected(self):
+        return False
+
+
+def set_mac(mac):
+    """MAC address given to the next ESPNow() created"""
+    global _next_mac
+    _next_mac = bytes(mac)
+
+
+def take_mac():
+    global _next_mac, _counter
+    if _next_mac is not None:
+        mac, _next_mac = _next_mac, None
+        return mac
+    _counter += 1
+    return bytes((0x02, 0, 0, 0, (_counter >> 8) & 0xFF, _counter & 0xFF))
+
+
+air = Air()
+
+
+def install(loss=0.0, latency_ms=0, jitter_ms=0, seed=None, udp_port=None):
+    """Registers this module as `espnow` (and a stub `network` if missing).
+
+    Returns the fresh Air shared by all stations created afterwards: in
+    this process, or over UDP from `udp_port` up when given.
+    """
+    global air
+    if udp_port:
+        air = UdpAir(udp_port, loss, latency_ms, jitter_ms, seed)
+    else:
+        air = Air(loss, latency_ms, jitter_ms, seed)
+    sys.modules['espnow'] = sys.modules[__name__]
+    if 'network' not in sys.modules:
+        network = types.ModuleType('network')
+        network.STA_IF = 0
+        network.AP_IF = 1
+        network.WLAN = WLAN
+        sys.modules['network'] = network
+    return air
@@ -1,5 +1,13 @@
 import time
-from machine import I2C
+
+try:
+    from time import sleep_ms, sleep_us
+except ImportError:
+    # CPython
+    def sleep_ms(ms):
+        time.sleep(ms / 1000)
+    def sleep_us(us):
+        time.sleep(us / 1000000)
 
 # LCD Constants
 LCD_I2C_ADDR = 0x27
@@ -12,42 +20,79 @@ LCD_LINE_2 = 0xC0
 LCD_BACKLIGHT = 0x08
 ENABLE = 0x04
 
+# HD44780 timings (datasheet, 270 kHz oscillator)
+POWER_ON_MS = 40     # after Vcc rises
+INIT_WAIT_US = 4100  # after the first function set
+CLEAR_US = 1520      # clear display / return home
+# Every other instruction runs in 37 us, less than the four bus bytes
+# (90 us at 400 kHz) it takes to send the next one, and the enable pulse
+# (230 ns) is far shorter than one bus byte, so bursts need no waits.
+
+BURST_CHARS = 40     # characters per writeto (one DDRAM line)
+
 class I2cLcd:
     def __init__(self, i2c, i2c_addr, num_lines, num_columns):
         self.i2c = i2c
         self.i2c_addr = i2c_addr
         self.num_lines = num_lines
         self.num_columns = num_columns
+        # What the display currently shows, and where the cursor is, so
+        # show() only sends the cells that change
+        self.shown = [bytearray(b' ' * num_columns) for _ in range(num_lines)]
+        self.col = 0
+        self.row = 0
+        # Expander states for a whole burst: 4 bus bytes per LCD byte
+        self._buf = bytearray(4 * BURST_CHARS)
+        self._view = memoryview(self._buf)
         
-        time.sleep_ms(20)
-        self.lcd_byte(0x03, LCD_CMD)
-        self.lcd_byte(0x03, LCD_CMD)
-        self.lcd_byte(0x03, LCD_CMD)
-        self.lcd_byte(0x02, LCD_CMD)
+        # Reset into 4-bit mode by instruction (datasheet figure 24)
+        sleep_ms(POWER_ON_MS)
+        self._nibble(0x30)
+        sleep_us(INIT_WAIT_US)
+        self._nibble(0x30)
+        sleep_us(100)
+        self._nibble(0x30)
+        self._nibble(0x20)
 
         self.lcd_byte(0x28, LCD_CMD)
         self.lcd_byte(0x0C, LCD_CMD)
         self.lcd_byte(0x06, LCD_CMD)
         self.lcd_byte(0x01, LCD_CMD)
-        time.sleep_ms(5)
+        sleep_us(CLEAR_US)
 
-    def lcd_byte(self, bits, mode):
-        bits_high = mode | (bits & 0xF0) | LCD_BACKLIGHT
-        bits_low = mode | ((bits << 4) & 0xF0) | LCD_BACKLIGHT
+    def _nibble(self, bits):
+        """Latches one nibble (only used while the controller is in 8-bit mode)"""
+        buf = self._buf
+        buf[0] = bits | LCD_BACKLIGHT | ENABLE
+        buf[1] = bits | LCD_BACKLIGHT
+        self.i2c.writeto(self.i2c_addr, self._view[:2])
 
-        self.i2c.writeto(self.i2c_addr, bytearray([bits_high | ENABLE]))
-        time.sleep_us(50) # Enable pulse
-        self.i2c.writeto(self.i2c_addr, bytearray([bits_high & ~ENABLE]))
-        time.sleep_us(100)
+    def _write(self, data, mode):
+        """Sends bytes as bursts: one writeto per BURST_CHARS bytes"""
+        buf = self._buf
+        for start in range(0, len(data), BURST_CHARS):
+            i = 0
+            for bits in data[start:start + BURST_CHARS]:
+                high = mode | (bits & 0xF0) | LCD_BACKLIGHT
+                low = mode | ((bits << 4) & 0xF0) | LCD_BACKLIGHT
+                # Data is latched on the falling edge of ENABLE
+                buf[i] = high | ENABLE
+                buf[i + 1] = high
+                buf[i + 2] = low | ENABLE
+                buf[i + 3] = low
+                i += 4
+            self.i2c.writeto(self.i2c_addr, self._view[:i])
 
-        self.i2c.writeto(self.i2c_addr, bytearray([bits_low | ENABLE]))
-        time.sleep_us(50)
-        self.i2c.writeto(self.i2c_addr, bytearray([bits_low & ~ENABLE]))
-        time.sleep_us(100)
+    def lcd_byte(self, bits, mode):
+        self._write((bits,), mode)
 
     def clear(self):
         self.lcd_byte(0x01, LCD_CMD)
-        time.sleep_ms(2)
+        sleep_us(CLEAR_US)
+        for line in self.shown:
+            line[:] = b' ' * self.num_columns
+        self.col = 0
+        self.row = 0
 
     def move_to(self, col, row):
         if row == 0:
@@ -55,7 +100,45 @@ class I2cLcd:
         else:
             addr = LCD_LINE_2 + col
         self.lcd_byte(addr, LCD_CMD)
+        self.col = col
+        self.row = row
 
     def put_str(self, message):
-        for char in message:
-            self.lcd_byte(ord(char), LCD_CHR)
+        self.put_bytes(bytes(ord(char) & 0xFF for char in message))
+
+    def put_bytes(self, data):
+        """Writes character codes at the cursor"""
+        self._write(data, LCD_CHR)
+        if self.row < self.num_lines and self.col < self.num_columns:
+            end = min(self.col + len(data), self.num_columns)
+            self.shown[self.row][self.col:end] = data[:end - self.col]
+        self.col += len(data)
+
+    def show(self, *lines):
+        """Makes the display show `lines`, sending only the changed cells.
+
+        Never clears the screen; the cursor is moved only to skip runs of
+        unchanged cells longer than one (a move costs as much as one cell).
+        """
+        width = self.num_columns
+        for row in range(self.num_lines):
+            text = lines[row] if row < len(lines) else ''
+            want = bytes(ord(c) & 0xFF for c in text[:width]) + b' ' * (width - min(len(text), width))
+            shown = self.shown[row]
+            col = 0
+            while col < width:
+                if shown[col] == want[col]:
+                    col += 1
+                    continue
+                end = col + 1
+                while end < width:
+                    if shown[end] != want[end]:
+                        end += 1
+                    elif end + 1 < width and shown[end + 1] != want[end + 1]:
+                        end += 2
+                    else:
+                        break
+                if self.col != col or self.row != row:
+                    self.move_to(col, row)
+                self.put_bytes(want[col:end])
+                col = end
@@ -0,0 +1,166 @@
+"""
+Latency instrumentation for the Alice -> Bob -> Telegram pipeline
+
+Nothing is instrumented until enable() is called: the hooked methods are
+the plain class methods, so a disabled build pays nothing. enable() wraps
+each hooked method of the modules already imported in a timing span
+(ticks_us on MicroPython, perf_counter_ns on CPython):
+
+    import instrument
+    instrument.enable()
+    ...
+    instrument.summary()     # per-stage table over serial
+
+Each stage keeps its last SAMPLES durations in a fixed ring buffer (for
+percentiles) and a log2 histogram over all calls, so memory stays fixed
+however long it runs. async_runtime prints the summary when SUMMARY_KEY
+(Ctrl-P) arrives on the serial console.
+"""
+
+import sys
+from array import array
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:
+    # CPython
+    from time import perf_counter_ns
+    def ticks_us():
+        return perf_counter_ns() // 1000
+    def ticks_diff(a, b):
+        return a - b
+
+SAMPLES = 64
+BUCKETS = 24        # log2(us): 1 us ... 8 s
+SUMMARY_KEY = '\x10'
+
+# (module, class, method, stage)
+HOOKS = (
+    ('enigma', 'MaquinaEnigma', 'cifrar_mensaje', 'enigma.cifrar_mensaje'),
+    ('enigma', 'MaquinaEnigma', 'cifrar_bytes', 'enigma.cifrar_bytes'),
+    ('enigma_mcu', 'MaquinaEnigmaMCU', 'cifrar_bytes', 'enigma_mcu.cifrar_bytes'),
+    ('esp_now_utils', 'EspNowLink', 'send_json', 'espnow.send_json'),
+    ('esp_now_utils', 'EspNowLink', 'receive_json', 'espnow.receive_json'),
+    ('esp_now_utils', 'EspNowLink', 'send_packet', 'espnow.send_packet'),
+    ('esp_now_utils', 'EspNowLink', 'receive_all', 'espnow.receive_all'),
+    ('i2c_lcd', 'I2cLcd', 'put_str', 'lcd.put_str'),
+    ('i2c_lcd', 'I2cLcd', 'show', 'lcd.show'),
+    ('async_runtime', 'Receiver', 'decrypt', 'receiver.decrypt'),
+)
+
+# Coroutine methods: timed from the call until the await completes
+ASYNC_HOOKS = (
+    # send_message and TelegramDelivery both go through send_message_status
+    ('telegram_bot', 'TelegramBot', 'send_message_status', 'telegram.send_message'),
+    ('async_runtime', 'Sender', 'send', 'espnow.send_packet'),
+)
+
+
+class Stage:
+    """Durations (us) of one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.samples = array('I', bytes(4 * SAMPLES))
+        self.histogram = array('I', bytes(4 * BUCKETS))
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, us):
+        self.samples[self.count % SAMPLES] = us
+        self.count += 1
+        self.total += us
+        if us > self.max:
+            self.max = us
+        bucket = 0
+        while us > 1 and bucket < BUCKETS - 1:
+            us >>= 1
+            bucket += 1
+        self.histogram[bucket] += 1
+
+    def percentile(self, p):
+        """p-th percentile of the samples in the ring buffer"""
+        n = min(self.count, SAMPLES)
+        if not n:
+            return 0
+        recent = sorted(self.samples[:n])
+        return recent[min(n - 1, n * p // 100)]
+
+
+stages = {}
+_patched = []
+
+
+def stage(name):
+    s = stages.get(name)
+    if s is None:
+        s = stages[name] = Stage(name)
+    return s
+
+
+def _timed(method, s):
+    def timed(*args, **kwargs):
+        start = ticks_us()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            s.add(ticks_diff(ticks_us(), start))
+    return timed
+
+
+def _timed_async(method, s):
+    async def timed(*args, **kwargs):
+        start = ticks_us()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            s.add(ticks_diff(ticks_us(), start))
+    return timed
+
+
+def enable():
+    """Hooks every method in HOOKS and ASYNC_HOOKS whose module is already imported"""
+    if _patched:
+        return
+    for hooks, wrap in ((HOOKS, _timed), (ASYNC_HOOKS, _timed_async)):
+        for module, cls_name, method, name in hooks:
+            cls = getattr(sys.modules.get(module), cls_name, None)
+            original = getattr(cls, method, None)
+            if original is None:
+                continue
+            setattr(cls, method, wrap(original, stage(name)))
+            _patched.append((cls, method, original))
+
+
+def disable():
+    """Restores the original methods"""
+    while _patched:
+        cls, method, original = _patched.pop()
+        setattr(cls, method, original)
+
+
+def enabled():
+    return bool(_patched)
+
+
+def reset():
+    stages.clear()
+    if _patched:
+        disable()
+        enable()
+
+
+def summary(out=print, histograms=False):
+    """Prints count, mean and percentiles (us) of every stage"""
+    out("{:<24}{:>7}{:>9}{:>9}{:>9}{:>9}".format('stage', 'calls', 'mean', 'p50', 'p99', 'max'))
+    for name in sorted(stages):
+        s = stages[name]
+        if not s.count:
+            continue
+        out("{:<24}{:>7}{:>9}{:>9}{:>9}{:>9}".format(
+            name, s.count, s.total // s.count, s.percentile(50), s.percentile(99), s.max))
+        if histograms:
+            for bucket, n in enumerate(s.histogram):
+                if n:
+                    out("  <{:>9} us {:>7} {}".format(2 << bucket, n, '#' * (n * 40 // s.count)))
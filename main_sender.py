@@ -2,9 +2,11 @@ import sys
 import uselect
 import time
 from machine import Pin, I2C
-from enigma import MaquinaEnigma
+from enigma_mcu import MaquinaEnigmaMCU
 from i2c_lcd import I2cLcd
 from esp_now_utils import EspNowLink
+from async_runtime import Sender
+import instrument
 
 # --- CONFIGURATION ---
 # LCD Pins (I2C)
@@ -16,6 +18,9 @@ I2C_ADDR = 0x27
 # REPLACE THIS with the MAC address from get_mac.py running on the other ESP32
 TARGET_MAC = "FF:FF:FF:FF:FF:FF" 
 
+# Time each pipeline stage; Ctrl-P on the console prints the summary
+INSTRUMENT = False
+
 # --- INPUT HANDLING ---
 
 spoll = uselect.poll()
@@ -33,10 +38,7 @@ def wait_for_input(lcd, prompt_line1, prompt_line2, valid_options=None):
     print(f"{prompt_line2}")
     
     if lcd:
-        lcd.clear()
-        lcd.put_str(prompt_line1[:16])
-        lcd.move_to(0, 1)
-        lcd.put_str(prompt_line2[:16])
+        lcd.show(prompt_line1[:16], prompt_line2[:16])
         
     while True:
         char = read_char()
@@ -79,8 +81,7 @@ def run_setup_wizard(lcd):
             else:
                 print("Already selected!")
                 if lcd:
-                    lcd.clear()
-                    lcd.put_str("Used! Pick other")
+                    lcd.show("Used! Pick other")
                     time.sleep(1)
 
     # 3. Positions
@@ -107,8 +108,7 @@ def setup():
         else:
             addr = I2C_ADDR
         lcd = I2cLcd(i2c, addr, 2, 16)
-        lcd.clear()
-        lcd.put_str("Enigma Sender")
+        lcd.show("Enigma Sender")
         time.sleep(2)
     except Exception as e:
         print(f"LCD Init Error: {e}")
@@ -118,7 +118,8 @@ def setup():
     rotors, positions = run_setup_wizard(lcd)
     
     # 3. Setup Enigma
-    enigma = MaquinaEnigma(rotors, positions)
+    # Viper engine: typing a letter allocates nothing
+    enigma = MaquinaEnigmaMCU(rotors, positions)
     
     # 4. Setup ESP-NOW
     link = EspNowLink()
@@ -135,114 +136,15 @@ def setup():
 def main():
     lcd, enigma, link, rotors, positions = setup()
     
-    buffer_raw = ""
-    buffer_encrypted = ""
-    
-    if lcd:
-        lcd.clear()
-        lcd.move_to(0, 0)
-        lcd.put_str("Ready to type...")
-    
     print("\n--- ALICE (SENDER) READY ---")
     print("Type characters to encrypt.")
     print("Press ENTER to send to Bob.")
     print("Press TAB to clear.")
+    if INSTRUMENT:
+        instrument.enable()
     
-    while True:
-        char = read_char()
-        
-        if char:
-            # Handle special characters
-            if char == '\n' or char == '\r':
-                # Confirmation Step
-                if buffer_encrypted:
-                    print(f"\n\nMessage to send: {buffer_encrypted}")
-                    print("Confirm send? (1=Yes, 2=No)")
-                    
-                    if lcd:
-                        lcd.clear()
-                        lcd.put_str(f"Send \"{buffer_raw[:10]}\"?")
-                        lcd.move_to(0, 1)
-                        lcd.put_str("1:Yes 2:No")
-                    
-                    while True:
-                        confirm = read_char()
-                        if confirm == '1':
-                            # YES - Send via ESP-NOW
-                            print("Sending to Bob...")
-                            if lcd:
-                                lcd.clear()
-                                lcd.put_str("Sending...")
-                            
-                            # Prepare Packet
-                            packet = {
-                                "rotors": rotors,
-                                "pos": positions,
-                                "text": buffer_encrypted,
-                                "raw": buffer_raw # Optional: Send raw too if Bob needs to verify? 
-                                                  # But Bob is supposed to decrypt. 
-                                                  # Let's send just what's needed for decryption.
-                            }
-                            
-                            success = link.send_json(TARGET_MAC, packet)
-                            
-                            if lcd:
-                                lcd.move_to(0, 1)
-                                lcd.put_str("Sent!" if success else "Failed!")
-                                time.sleep(1)
-                                lcd.clear()
-                                lcd.put_str("Ready...")
-                            
-                            buffer_raw = ""
-                            buffer_encrypted = ""
-                            break
-                            
-                        elif confirm == '2':
-                            # NO - Cancel
-                            print("Cancelled.")
-                            if lcd:
-                                lcd.clear()
-                                lcd.put_str("Cancelled")
-                                time.sleep(1)
-                                lcd.clear()
-                                lcd.put_str(buffer_raw[-16:])
-                                lcd.move_to(0, 1)
-                                lcd.put_str(buffer_encrypted[-16:])
-                            break
-                        time.sleep(0.1)
-                continue
-                
-            if char == '\t': # Tab to clear
-                buffer_raw = ""
-                buffer_encrypted = ""
-                enigma.reset()
-                if lcd:
-                    lcd.clear()
-                    lcd.put_str("Cleared")
-                    time.sleep(0.5)
-                    lcd.clear()
-                print("\nCleared.")
-                continue
-
-            # Process printable characters
-            if ' ' <= char <= '~':
-                encrypted_char = enigma.cifrar_letra(char)
-                buffer_raw += char
-                buffer_encrypted += encrypted_char
-                
-                print(f"{char} -> {encrypted_char}")
-                
-                if lcd:
-                    if len(buffer_raw) == 1:
-                        lcd.clear()
-                    
-                    display_raw = buffer_raw[-16:]
-                    display_enc = buffer_encrypted[-16:]
-                    
-                    lcd.move_to(0, 0)
-                    lcd.put_str(display_raw)
-                    lcd.move_to(0, 1)
-                    lcd.put_str(display_enc)
+    # Typing, LCD and radio run as separate asyncio tasks
+    Sender(lcd, enigma, link, rotors, positions, TARGET_MAC).run()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,136 @@
+"""
+Mock I2C bus with an emulated PCF8574 + HD44780 16x2 LCD (CPython)
+
+Lets I2cLcd run on a PC and measures what it costs on the bus:
+
+    bus = MockI2C()
+    lcd = I2cLcd(bus, 0x27, 2, 16)
+    lcd.show("Hello", "World")
+    bus.lcd.lines()        # ['Hello           ', 'World           ']
+    bus.transactions       # writeto calls
+    bus.bus_us             # time those bytes take on the wire at `freq`
+
+The controller is decoded from the expander pins (P0=RS, P2=E, P4-P7=D4-D7,
+data latched on the falling edge of E), including the 8-bit -> 4-bit reset
+sequence. Instructions arriving while the controller is still busy with
+the previous one are counted in `lcd.violations`; time is the real time
+spent in sleeps plus the simulated bus time.
+"""
+
+import time
+
+RS = 0x01
+ENABLE = 0x04
+
+EXEC_US = 37
+CLEAR_US = 1520
+
+
+class HD44780:
+    """Display controller behind a PCF8574 backpack"""
+
+    def __init__(self, lines=2, columns=16):
+        self.columns = columns
+        self.ddram = bytearray(b' ' * 0x80)
+        self.addr = 0
+        self.eight_bit = True
+        self.pending = None      # high nibble waiting for its low half
+        self.increment = 1
+        self.display_on = False
+        self.instructions = 0
+        self.violations = 0
+        self.busy_until = 0.0
+        self._pins = 0
+        self._line_bases = (0x00, 0x40, 0x14, 0x54)[:lines]
+
+    def pins(self, value, now_us):
+        """New expander output; latches on the falling edge of E"""
+        if self._pins & ENABLE and not value & ENABLE:
+            self._latch(value, now_us)
+        self._pins = value
+
+    def _latch(self, value, now_us):
+        nibble = value & 0xF0
+        rs = value & RS
+        if self.eight_bit:
+            # Only D7-D4 are wired: the low four bits read as 0
+            self._execute(nibble, rs, now_us)
+        elif self.pending is None:
+            self.pending = nibble
+        else:
+            byte = self.pending | (nibble >> 4)
+            self.pending = None
+            self._execute(byte, rs, now_us)
+
+    def _execute(self, byte, rs, now_us):
+        if now_us < self.busy_until:
+            self.violations += 1
+        self.instructions += 1
+        duration = EXEC_US
+        if rs:
+            self.ddram[self.addr & 0x7F] = byte
+            self.addr = (self.addr + self.increment) & 0x7F
+        elif byte & 0x80:
+            self.addr = byte & 0x7F
+        elif byte & 0x40:
+            pass  # CGRAM address: custom characters are not emulated
+        elif byte & 0x20:
+            self.eight_bit = bool(byte & 0x10)
+        elif byte & 0x10:
+            pass  # cursor/display shift
+        elif byte & 0x08:
+            self.display_on = bool(byte & 0x04)
+        elif byte & 0x04:
+            self.increment = 1 if byte & 0x02 else -1
+        elif byte & 0x02:
+            self.addr = 0
+            duration = CLEAR_US
+        elif byte & 0x01:
+            self.ddram[:] = b' ' * len(self.ddram)
+            self.addr = 0
+            self.increment = 1
+            duration = CLEAR_US
+        self.busy_until = now_us + duration
+
+    def lines(self):
+        return [bytes(self.ddram[base:base + self.columns]).decode('latin-1')
+                for base in self._line_bases]
+
+
+class MockI2C:
+    """Subset of machine.I2C: writeto() into an emulated LCD"""
+
+    def __init__(self, addr=0x27, freq=400000, lines=2, columns=16):
+        self.addr = addr
+        self.freq = freq
+        self.lcd = HD44780(lines, columns)
+        self.transactions = 0
+        self.bytes_written = 0
+        self.bus_us = 0.0
+        self._bus_total = 0.0   # never reset: part of the emulated clock
+        self._start = time.perf_counter()
+
+    def scan(self):
+        return [self.addr]
+
+    def _now_us(self):
+        return (time.perf_counter() - self._start) * 1e6 + self._bus_total
+
+    def writeto(self, addr, buf, stop=True):
+        if addr != self.addr:
+            raise OSError(19)  # ENODEV, like a NACKed address
+        self.transactions += 1
+        self.bytes_written += len(buf)
+        # START + address byte, then 9 clocks per data byte
+        byte_us = 9 * 1e6 / self.freq
+        self.bus_us += byte_us * (len(buf) + 1)
+        self._bus_total += byte_us
+        for value in bytes(buf):
+            self._bus_total += byte_us
+            self.lcd.pins(value, self._now_us())
+        return len(buf)
+
+    def reset_counters(self):
+        self.transactions = 0
+        self.bytes_written = 0
+        self.bus_us = 0.0
@@ -1,14 +1,119 @@
 import network
-import urequests
+import json
 import time
 
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+try:
+    from time import ticks_ms, ticks_diff, ticks_add
+except ImportError:
+    # CPython
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+    def ticks_diff(a, b):
+        return a - b
+    def ticks_add(a, b):
+        return a + b
+
+WIFI_WAIT_MS = 1000
+
+# Where the Bot API is; fake_board points these at telegram_standin
+TELEGRAM_HOST = "api.telegram.org"
+TELEGRAM_PORT = 443
+TELEGRAM_TLS = True
+MAX_MESSAGE_LEN = 4096  # Telegram's sendMessage limit
+
+class HttpSession:
+    """Minimal HTTP/1.1 client over asyncio streams (uasyncio on the board)
+    keeping one connection (TLS by default) open between requests, so only
+    the first request pays for the handshake and waiting for the server
+    never blocks the other tasks. `timeout` bounds each request."""
+
+    def __init__(self, host, port=443, use_tls=True, timeout=10):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self.connections = 0
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=True if self.use_tls else None),
+            self.timeout)
+        self.connections += 1
+
+    async def close(self):
+        writer = self.writer
+        self.reader = None
+        self.writer = None
+        if writer is not None:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def request(self, method, path, body=b'', content_type='application/json'):
+        """Returns (status, response body). Reconnects once if the kept-alive
+        connection turns out to be closed."""
+        for attempt in (0, 1):
+            fresh = self.writer is None
+            try:
+                if fresh:
+                    await self._connect()
+                return await asyncio.wait_for(
+                    self._exchange(method, path, body, content_type), self.timeout)
+            except (OSError, ValueError, IndexError, EOFError, asyncio.TimeoutError):
+                # Also a garbled or truncated response: start over on a
+                # new connection
+                await self.close()
+                if fresh or attempt:
+                    raise
+
+    async def _exchange(self, method, path, body, content_type):
+        reader = self.reader
+        head = "{} {} HTTP/1.1\r\nHost: {}\r\nContent-Type: {}\r\nContent-Length: {}\r\nConnection: keep-alive\r\n\r\n".format(
+            method, path, self.host, content_type, len(body))
+        self.writer.write(head.encode() + body)
+        await self.writer.drain()
+
+        line = await reader.readline()
+        if not line:
+            raise OSError("Connection closed")
+        status = int(line.split(None, 2)[1])
+        length = 0
+        close = False
+        while True:
+            line = await reader.readline()
+            if not line or line == b'\r\n':
+                break
+            name, _, value = line.decode().partition(':')
+            name = name.strip().lower()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'connection' and value.strip().lower() == 'close':
+                close = True
+        data = await reader.readexactly(length) if length else b''
+        if close:
+            await self.close()
+        return status, data
+
 class TelegramBot:
-    def __init__(self, token, chat_id, ssid=None, password=None):
+    def __init__(self, token, chat_id, ssid=None, password=None,
+                 host=None, port=None, use_tls=None):
         self.token = token
         self.chat_id = chat_id
         self.ssid = ssid
         self.password = password
         self.wlan = network.WLAN(network.STA_IF)
+        # One kept-alive connection for every API call
+        self.session = HttpSession(host or TELEGRAM_HOST, port or TELEGRAM_PORT,
+                                   TELEGRAM_TLS if use_tls is None else use_tls)
 
     def connect_wifi(self):
         """Connects to Wi-Fi if credentials are provided"""
@@ -37,13 +142,33 @@ class TelegramBot:
             print('Connection failed')
             return False
 
+    async def api_call(self, method, data):
+        """Calls a Bot API method. Returns (http_status, response_dict).
+
+        Raises OSError on network errors."""
+        path = "/bot{}/{}".format(self.token, method)
+        status, body = await self.session.request('POST', path, json.dumps(data).encode())
+        try:
+            return status, json.loads(body)
+        except ValueError:
+            return status, {}
+
     def send_message(self, message):
-        """Sends a message to the configured Telegram chat"""
+        """Sends a message to the configured Telegram chat (blocking, for use
+        outside an event loop; the connection is closed afterwards)"""
+        async def send():
+            try:
+                return await self.send_message_status(message)
+            finally:
+                await self.session.close()
+        return asyncio.run(send())[0] == 200
+
+    async def send_message_status(self, message):
+        """Like send_message, but returns (http_status or None, response_dict)"""
         if not self.wlan.isconnected():
             print("Wi-Fi not connected. Cannot send Telegram message.")
-            return False
+            return None, {}
             
-        url = "https://api.telegram.org/bot{}/sendMessage".format(self.token)
         data = {
             'chat_id': self.chat_id,
             'text': message,
@@ -51,10 +176,108 @@ class TelegramBot:
         }
         
         try:
-            headers = {'Content-Type': 'application/json'}
-            response = urequests.post(url, json=data, headers=headers)
-            response.close()
-            return True
+            return await self.api_call('sendMessage', data)
         except Exception as e:
             print("Error sending Telegram message:", e)
+            await self.session.close()
+            return None, {}
+
+class TelegramDelivery:
+    """Outbound queue in front of TelegramBot.
+
+    Messages arriving within `coalesce_ms` of the oldest queued one go out
+    as one sendMessage (up to Telegram's 4096 chars). Failed sends stay queued and
+    are retried with exponential backoff, honouring the `retry_after` of
+    429 responses; messages the API rejects outright are dropped.
+    """
+
+    def __init__(self, bot, max_queue=16, coalesce_ms=300, backoff_ms=1000,
+                 max_backoff_ms=60000, max_attempts=6, wifi=None):
+        self.bot = bot
+        self.wifi = wifi         # WifiManager; None: connect inline
+        self.max_queue = max_queue
+        self.coalesce_ms = coalesce_ms
+        self.backoff_ms = backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+        self.max_attempts = max_attempts
+        self.queue = []          # (text, queued_at)
+        self.attempts = 0
+        self.not_before = None   # ticks_ms before which we must not retry
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def enqueue(self, text):
+        """Queues a message. Returns False (and counts a drop) when full."""
+        if len(self.queue) >= self.max_queue:
+            self.dropped += 1
+            return False
+        self.queue.append((text, ticks_ms()))
+        return True
+
+    def pending(self):
+        return len(self.queue)
+
+    def full(self):
+        return len(self.queue) >= self.max_queue
+
+    def ready_in_ms(self):
+        """Milliseconds until deliver() should run, or None if nothing queued"""
+        if not self.queue:
+            return None
+        now = ticks_ms()
+        wait = 0
+        if self.not_before is not None:
+            wait = max(wait, ticks_diff(self.not_before, now))
+        if self.wifi is not None and not self.wifi.is_ready():
+            wait = max(wait, WIFI_WAIT_MS)
+        if len(self._batch()) == len(self.queue):
+            # Leave the window open for more messages to join the batch,
+            # but only coalesce_ms from the oldest, however many keep coming
+            wait = max(wait, self.coalesce_ms - ticks_diff(now, self.queue[0][1]))
+        return max(0, wait)
+
+    def _batch(self):
+        """Leading queued messages that fit in one sendMessage"""
+        batch = []
+        size = 0
+        for text, _ in self.queue:
+            extra = len(text) + (2 if batch else 0)
+            if batch and size + extra > MAX_MESSAGE_LEN:
+                break
+            batch.append(text)
+            size += extra
+        return batch
+
+    async def deliver(self):
+        """Sends the next batch. Returns True if it was delivered."""
+        batch = self._batch()
+        if not batch:
+            return True
+        if self.wifi is None and not self.bot.wlan.isconnected():
+            self.bot.connect_wifi()
+        status, response = await self.bot.send_message_status("\n\n".join(batch))
+
+        if status == 200:
+            del self.queue[:len(batch)]
+            self.sent += len(batch)
+            self.attempts = 0
+            self.not_before = None
+            return True
+
+        self.attempts += 1
+        if status is not None and 400 <= status < 500 and status != 429 or self.attempts >= self.max_attempts:
+            print("Telegram rejected message ({}), dropping".format(status))
+            del self.queue[:len(batch)]
+            self.failed += len(batch)
+            self.attempts = 0
+            self.not_before = None
             return False
+
+        delay = min(self.backoff_ms << (self.attempts - 1), self.max_backoff_ms)
+        if status == 429:
+            retry_after = response.get('parameters', {}).get('retry_after')
+            if retry_after:
+                delay = max(delay, retry_after * 1000)
+        self.not_before = ticks_add(ticks_ms(), delay)
+        return False
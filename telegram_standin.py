@@ -0,0 +1,110 @@
+"""
+Local stand-in for the Telegram Bot API (CPython only)
+
+Speaks plain HTTP/1.1 with keep-alive and answers sendMessage like
+api.telegram.org, so TelegramBot/TelegramDelivery can be tested on a PC:
+
+    server = telegram_standin.start()
+    bot = TelegramBot("token", "chat", host="127.0.0.1",
+                      port=server.port, use_tls=False)
+    ...
+    server.messages        # texts received, in order
+    server.fail_next(2, retry_after=1)   # next 2 calls get a 429
+
+Run it standalone with `python telegram_standin.py [port]`.
+"""
+
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        method = self.path.rsplit('/', 1)[-1]
+        with server.lock:
+            server.requests += 1
+            failure = server.failures.pop(0) if server.failures else None
+
+        if failure is not None:
+            status, retry_after = failure
+            reply = {'ok': False, 'error_code': status,
+                     'description': 'Too Many Requests' if status == 429 else 'Error'}
+            if retry_after is not None:
+                reply['parameters'] = {'retry_after': retry_after}
+        elif method != 'sendMessage':
+            status = 404
+            reply = {'ok': False, 'error_code': 404, 'description': 'Not Found'}
+        else:
+            try:
+                data = json.loads(body)
+                text = data['text']
+            except (ValueError, KeyError):
+                status = 400
+                reply = {'ok': False, 'error_code': 400, 'description': 'Bad Request'}
+            else:
+                with server.lock:
+                    server.messages.append(text)
+                    server.arrivals.append(time.monotonic())
+                    message_id = len(server.messages)
+                status = 200
+                reply = {'ok': True, 'result': {'message_id': message_id, 'text': text}}
+
+        payload = json.dumps(reply).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), _Handler)
+        self.lock = threading.Lock()
+        self.messages = []
+        self.arrivals = []   # time.monotonic() of each message
+        self.failures = []   # (status, retry_after) for the next requests
+        self.connections = 0
+        self.requests = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def fail_next(self, count=1, status=429, retry_after=None):
+        """Makes the next `count` API calls fail with `status`"""
+        with self.lock:
+            self.failures.extend([(status, retry_after)] * count)
+
+
+def start(host='127.0.0.1', port=0):
+    """Starts a stand-in server in a background thread"""
+    server = StandinServer(host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    server = StandinServer('127.0.0.1', int(sys.argv[1]) if len(sys.argv) > 1 else 8081)
+    print("Telegram stand-in on http://127.0.0.1:{}".format(server.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,173 @@
+"""
+Published Enigma test vectors, and the engines checked against each other
+
+    python -m pytest tests
+"""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import enigma_cli  # noqa: E402
+import enigma_np  # noqa: E402
+from enigma import MaquinaEnigma, CacheSustituciones, _paso, pasos_rotores  # noqa: E402
+from enigma_mcu import MaquinaEnigmaMCU  # noqa: E402
+
+ROTORES = ['I', 'II', 'III', 'IV', 'V']
+LETRAS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+BARBAROSSA = {
+    'rotores': ['II', 'IV', 'V'],
+    'posiciones': 'BLA',
+    'anillos': 'BUL',
+    'clavijas': 'AV BS CG DL FU HZ IN KM OW RX',
+}
+
+
+def _ventanas(maquina):
+    return ''.join(chr(65 + r.posicion) for r in maquina.rotores)
+
+
+def _claves(n, semilla=0):
+    """Random keys over every setting: 3-5 rotors, rings, plugboard, reflector"""
+    rnd = random.Random(semilla)
+    for _ in range(n):
+        k = rnd.choice([3, 4, 5])
+        letras = rnd.sample(LETRAS, 2 * rnd.randrange(11))
+        yield {
+            'seleccion_rotores': rnd.sample(ROTORES, k),
+            'posiciones_iniciales': ''.join(rnd.choice(LETRAS) for _ in range(k)),
+            'anillos': ''.join(rnd.choice(LETRAS) for _ in range(k)),
+            'clavijas': ' '.join(a + b for a, b in zip(letras[::2], letras[1::2])),
+            'reflector': rnd.choice(sorted(MaquinaEnigma.REFLECTORES)),
+        }
+
+
+def _texto(n, semilla=0):
+    rnd = random.Random(semilla)
+    return ''.join(rnd.choice(LETRAS + LETRAS.lower() + ' .,1') for _ in range(n))
+
+
+def test_bdzgo():
+    assert MaquinaEnigma(['I', 'II', 'III'], 'AAA').cifrar_mensaje('AAAAA') == 'BDZGO'
+
+
+def test_anillos_bbb():
+    assert MaquinaEnigma(['I', 'II', 'III'], 'AAA', anillos='BBB').cifrar_mensaje('AAAAA') == 'EWTYX'
+
+
+def test_doble_paso():
+    maquina = MaquinaEnigma(['I', 'II', 'III'], 'ADU')
+    ventanas = []
+    for _ in range(3):
+        maquina.cifrar_letra('A')
+        ventanas.append(_ventanas(maquina))
+    assert ventanas == ['ADV', 'AEW', 'BFX']
+
+
+def test_barbarossa():
+    maquina = MaquinaEnigma(BARBAROSSA['rotores'], BARBAROSSA['posiciones'],
+                            anillos=BARBAROSSA['anillos'], clavijas=BARBAROSSA['clavijas'])
+    assert maquina.cifrar_mensaje('EDPUD NRGYS ZRCXN') == 'AUFKL XABTE ILUNG'
+
+
+def test_barbarossa_cli(capsys):
+    assert enigma_cli.main(['--rotors', 'II,IV,V', '--pos', 'BLA', '--rings', 'BUL',
+                            '--plugboard', BARBAROSSA['clavijas'],
+                            '--text', 'EDPUD NRGYS ZRCXN']) == 0
+    assert capsys.readouterr().out.strip() == 'AUFKL XABTE ILUNG'
+
+
+def test_pasos_rotores_igual_que_paso():
+    rnd = random.Random(1)
+    for _ in range(200):
+        k = rnd.choice([3, 4, 5])
+        notches = [rnd.randrange(26) for _ in range(k)]
+        # Starts next to the notches exercise the double step
+        inicio = [(n + rnd.choice([-2, -1, 0, 1, 5])) % 26 for n in notches]
+        pos = list(inicio)
+        pasos = [0] * k
+        for t in range(1, 1000):
+            antes = list(pos)
+            _paso(pos, notches)
+            for j in range(k):
+                pasos[j] += pos[j] != antes[j]
+            if t % 37 == 0 or t < 30:
+                assert pasos_rotores(inicio, notches, t) == pasos, (inicio, notches, t)
+
+
+def test_seek_igual_que_pasos():
+    for clave in _claves(30):
+        maquina = MaquinaEnigma(**clave)
+        referencia = MaquinaEnigma(**clave)
+        texto = _texto(700)
+        salida = referencia.cifrar_mensaje(texto)
+        for n in (0, 1, 25, 26, 650, 676, 677):
+            maquina.seek(n)
+            referencia.reset()
+            referencia.cifrar_mensaje('A' * n)
+            assert _ventanas(maquina) == _ventanas(referencia)
+            assert maquina.tell() == n
+        # Decrypting from an offset matches the tail of the stream
+        letras = sum(c.isalpha() for c in texto[:350])
+        maquina.seek(letras)
+        assert maquina.cifrar_mensaje(salida[350:]) == texto[350:].upper()
+
+
+def test_cache_sustituciones_igual():
+    cache = CacheSustituciones()
+    for clave in _claves(20, semilla=2):
+        texto = _texto(300, semilla=3).encode()
+        assert MaquinaEnigma(cache=cache, **clave).cifrar_bytes(texto) == \
+            MaquinaEnigma(**clave).cifrar_bytes(texto)
+
+
+def test_cache_sustituciones_rotores_mezclados():
+    # One cache shared by 3-, 4- and 5-rotor keys, as on Bob; with more
+    # than 26 keys the ids reach what a 4-rotor key's offsets once covered
+    cache = CacheSustituciones(memoria_max=1 << 20)
+    texto = _texto(100, semilla=9).encode()
+    claves = [(['I', 'II', 'III', 'IV'], 'AAAA', 'AAAA')]
+    claves += [(['II', 'III', 'IV'], 'AAA', LETRAS[i] * 3) for i in range(26)]
+    claves += [(['V', 'I', 'II', 'III', 'IV'], 'AAAAA', LETRAS[i] * 5) for i in range(3)]
+    for _ in range(2):
+        for rotores, posiciones, anillos in claves:
+            assert MaquinaEnigma(rotores, posiciones, cache=cache, anillos=anillos).cifrar_bytes(texto) == \
+                MaquinaEnigma(rotores, posiciones, anillos=anillos).cifrar_bytes(texto), anillos
+
+
+def test_mcu_igual():
+    for clave in _claves(30, semilla=4):
+        texto = _texto(400, semilla=5).encode()
+        maquina = MaquinaEnigma(**clave)
+        mcu = MaquinaEnigmaMCU(**clave)
+        assert mcu.cifrar_bytes(texto) == maquina.cifrar_bytes(texto)
+        assert mcu.posiciones() == _ventanas(maquina)
+        mcu.seek(123)
+        maquina.seek(123)
+        assert mcu.cifrar_mensaje('HELLO WORLD') == maquina.cifrar_mensaje('HELLO WORLD')
+
+
+def test_np_igual():
+    if not enigma_np.DISPONIBLE:
+        pytest.skip("NumPy not installed")
+    for clave in _claves(30, semilla=6):
+        texto = _texto(3000, semilla=7).encode()
+        maquina = MaquinaEnigma(**clave)
+        vectorizada = MaquinaEnigma(**clave)
+        assert enigma_np.cifrar_bytes(vectorizada, texto) == maquina.cifrar_bytes(texto)
+        assert _ventanas(vectorizada) == _ventanas(maquina)
+        assert vectorizada.tell() == maquina.tell()
+
+
+@pytest.mark.parametrize('argumentos, error', [
+    (['--offset', '-3'], 'must be >= 0'),
+    (['--pos', 'AB1'], 'Posición no válida: 1'),
+])
+def test_cli_clave_no_valida(capsys, argumentos, error):
+    with pytest.raises(SystemExit):
+        enigma_cli.main(['--rotors', 'I,II,III', '--text', 'HELLO'] + argumentos)
+    assert error in capsys.readouterr().err
@@ -0,0 +1,180 @@
+"""
+ESP-NOW protocol on fake_espnow: binary packets, fragmentation, ACKs and
+retransmits, duplicate suppression and malformed frames
+
+    python -m pytest tests
+"""
+
+import os
+import random
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import fake_espnow  # noqa: E402
+
+fake_espnow.install()
+
+import esp_now_utils  # noqa: E402
+from esp_now_utils import EspNowLink, encode_packet, decode_packet  # noqa: E402
+
+BOB = b'\x02\x00\x00\x00\x00\xbb'
+ALICE = b'\x02\x00\x00\x00\x00\xaa'
+BOB_STR = ':'.join('{:02x}'.format(b) for b in BOB)
+ROTORES = ['I', 'II', 'III', 'IV', 'V']
+
+
+def _enlaces(loss=0.0, seed=0):
+    """(alice, bob) on a fresh Air"""
+    fake_espnow.install(loss=loss, seed=seed)
+    fake_espnow.set_mac(BOB)
+    bob = EspNowLink()
+    fake_espnow.set_mac(ALICE)
+    alice = EspNowLink()
+    alice.add_peer(BOB_STR)
+    return alice, bob
+
+
+def _recibir(bob, recibidos):
+    paquete = bob.receive_json(0)
+    while paquete:
+        recibidos.append(paquete[1])
+        paquete = bob.receive_json(0)
+
+
+def _enviar(alice, bob, texto, recibidos):
+    """Sends while Bob receives (and ACKs) in between, on one thread"""
+    pasos = alice.send_steps(BOB_STR, ['I', 'II', 'III'], 'ABC', texto)
+    try:
+        while True:
+            espera = next(pasos)
+            _recibir(bob, recibidos)
+            time.sleep(espera / 1000)
+    except StopIteration as e:
+        return e.value
+    finally:
+        _recibir(bob, recibidos)
+
+
+@pytest.mark.parametrize('n', [3, 4, 5])
+def test_paquete_ida_y_vuelta(n):
+    rnd = random.Random(n)
+    buf = bytearray(esp_now_utils.MAX_MESSAGE)
+    for _ in range(50):
+        rotores = rnd.sample(ROTORES, n)
+        posiciones = ''.join(rnd.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(n))
+        texto = bytes(rnd.randrange(32, 127) for _ in range(rnd.randrange(200)))
+        seq = rnd.randrange(1 << 16)
+        size = encode_packet(buf, seq, rotores, posiciones, texto)
+        assert size == esp_now_utils.HEADER_SIZE + len(texto)
+        assert decode_packet(buf[:size]) == (seq, rotores, posiciones, texto)
+
+
+def test_paquete_demasiado_grande():
+    with pytest.raises(ValueError):
+        encode_packet(bytearray(64), 0, ['I', 'II', 'III'], 'AAA', b'x' * 64)
+
+
+def test_fragmentos_con_perdidas():
+    alice, bob = _enlaces(loss=0.2, seed=1)
+    rnd = random.Random(2)
+    confirmados = set()
+    recibidos = []
+    for i in range(12):
+        # Up to 5 fragments
+        texto = '{:02d} '.format(i) + ''.join(rnd.choice('ABCDEFG ') for _ in range(rnd.randrange(1000)))
+        if _enviar(alice, bob, texto, recibidos):
+            confirmados.add(texto)
+    entregados = [d['text'] for d in recibidos]
+    assert len(entregados) == len(set(entregados))
+    assert set(entregados) == confirmados
+    assert alice.retransmits > 0
+
+
+def test_duplicados():
+    alice, bob = _enlaces()
+    buf = bytearray(64)
+    size = encode_packet(buf, 7, ['I', 'II', 'III'], 'ABC', b'HELLO')
+    for _ in range(3):
+        alice.e.send(BOB, buf[:size])
+    assert bob.receive_json(100)[1]['text'] == 'HELLO'
+    assert bob.receive_json(100) is None
+    assert bob.duplicates == 2
+    # Every copy is ACKed, so a sender whose ACK was lost stops retrying
+    acks = 0
+    host, msg = alice.e.recv(100)
+    while msg:
+        acks += msg[0] == esp_now_utils.ACK_MAGIC
+        host, msg = alice.e.recv(0)
+    assert acks == 3
+
+
+def _fragmentos(seq, texto):
+    buf = bytearray(esp_now_utils.MAX_MESSAGE)
+    size = encode_packet(buf, seq, ['I', 'II', 'III'], 'ABC', texto)
+    paso = esp_now_utils.FRAG_PAYLOAD
+    cuenta = (size + paso - 1) // paso
+    return [bytes([esp_now_utils.FRAG_MAGIC, seq >> 8, seq & 0xFF, i, cuenta])
+            + buf[i * paso:min(size, (i + 1) * paso)] for i in range(cuenta)]
+
+
+def _acks(enlace):
+    acks = []
+    host, msg = enlace.e.recv(100)
+    while msg:
+        if msg[0] == esp_now_utils.ACK_MAGIC:
+            acks.append(((msg[1] << 8) | msg[2], msg[3]))
+        host, msg = enlace.e.recv(0)
+    return acks
+
+
+def test_sin_hueco_para_reensamblar():
+    # A message in progress is not evicted for a new one: the newcomer's
+    # fragments go unACKed until a slot is free
+    alice, bob = _enlaces()
+    bob.reassembler = esp_now_utils.Reassembler(slots=1)
+    fake_espnow.set_mac(b'\x02\x00\x00\x00\x00\xcc')
+    carol = EspNowLink()
+    carol.add_peer(BOB_STR)
+    de_alice = _fragmentos(1, b'A' * 300)
+    de_carol = _fragmentos(2, b'C' * 300)
+    alice.e.send(BOB, de_alice[0])
+    carol.e.send(BOB, de_carol[0])
+    assert bob.receive_json(100) is None
+    assert bob.reassembler.refused == 1
+    assert _acks(carol) == []
+    alice.e.send(BOB, de_alice[1])
+    assert bob.receive_json(100)[1]['text'] == 'A' * 300
+    assert _acks(alice) == [(1, 0), (1, 1)]
+    for trama in de_carol:
+        carol.e.send(BOB, trama)
+    assert bob.receive_json(100)[1]['text'] == 'C' * 300
+    assert _acks(carol) == [(2, 0), (2, 1)]
+    assert bob.reassembler.dropped == 0
+
+
+def test_tramas_malformadas():
+    alice, bob = _enlaces()
+    frag = esp_now_utils.FRAG_MAGIC
+    tramas = [
+        b'\xe1',                                        # truncated header
+        bytes([esp_now_utils.PACKET_MAGIC, 0, 1, 7]) + bytes(7) + b'X',  # 7 rotors
+        bytes([esp_now_utils.PACKET_MAGIC, 0, 2, 3, 0xF0]) + bytes(6),   # bad rotor id
+        bytes([frag, 0, 3, 2, 2]) + b'X',               # index >= count
+        bytes([frag, 0, 4, 0, 0]) + b'X',               # zero fragments
+        bytes([frag, 0, 5, 0, 1]) + b'{"text":"HI"}',   # reassembles to JSON
+        bytes([frag, 0, 6, 0, 1]) + b'\xff\xfe',
+        b'{"text": ',
+        b'[1, 2]',
+        b'\xff\xfe\xfd',
+        bytes([esp_now_utils.ACK_MAGIC, 0, 1, 0]),
+    ]
+    for trama in tramas:
+        alice.e.send(BOB, trama)
+        assert bob.receive_json(100) is None, trama
+    recibidos = []
+    assert _enviar(alice, bob, 'STILL WORKS', recibidos)
+    assert [d['text'] for d in recibidos] == ['STILL WORKS']
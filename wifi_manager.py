@@ -0,0 +1,188 @@
+"""
+Background Wi-Fi connection manager for Bob
+
+WifiManager.poll() is a non-blocking state machine: it starts a connect,
+checks on it, and reconnects when the link drops. The caller runs it
+from a timer or an asyncio task (async_runtime does), so nothing else ever
+waits for Wi-Fi; other code checks the cheap is_ready().
+
+The AP's BSSID and channel are learnt once connected, cached (also in a
+small file, so they survive a reboot) and reused to rejoin without a full
+scan. The manager never scans itself, as a scan blocks the radio (and
+ESP-NOW) for seconds: without a BSSID it connects by SSID and lets the
+driver find the AP. The ESP32 has one radio, so ESP-NOW always runs on the
+channel the STA interface is on: while connected that is the AP's channel,
+and while disconnected the manager pins the radio to the last AP channel
+so ESP-NOW does not move while it reconnects.
+"""
+
+import network
+import json
+
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:
+    # CPython
+    import time
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+    def ticks_diff(a, b):
+        return a - b
+
+IDLE = 0
+CONNECTING = 1
+CONNECTED = 2
+WAITING = 3   # backing off before the next attempt
+
+CONNECT_TIMEOUT_MS = 15000
+RETRY_MS = 5000
+RESCAN_AFTER = 6     # failed attempts with the cached BSSID before connecting by SSID
+POLL_MS = 100        # while connecting
+CHECK_MS = 1000      # while connected / waiting
+CACHE_FILE = 'wifi_cache.json'
+
+# Status codes meaning "this attempt is over" (names differ between ports)
+_FAILED = tuple(getattr(network, name) for name in
+                ('STAT_NO_AP_FOUND', 'STAT_WRONG_PASSWORD', 'STAT_CONNECT_FAIL',
+                 'STAT_HANDSHAKE_TIMEOUT', 'STAT_ASSOC_FAIL', 'STAT_BEACON_TIMEOUT')
+                if hasattr(network, name))
+
+
+class WifiManager:
+    def __init__(self, ssid, password, link=None, wlan=None, cache_file=CACHE_FILE,
+                 timeout_ms=CONNECT_TIMEOUT_MS, retry_ms=RETRY_MS):
+        self.ssid = ssid
+        self.password = password
+        self.link = link      # EspNowLink to keep on the AP's channel
+        self.wlan = wlan or network.WLAN(network.STA_IF)
+        self.cache_file = cache_file
+        self.timeout_ms = timeout_ms
+        self.retry_ms = retry_ms
+        self.state = IDLE
+        self.bssid = None
+        self.channel = None
+        self.connects = 0
+        self.drops = 0
+        self.failures = 0     # consecutive failed attempts
+        self._since = ticks_ms()
+        self._load_cache()
+
+        self.wlan.active(True)
+        try:
+            # The driver's own reconnect scans every channel, which takes
+            # ESP-NOW with it; reconnecting is handled here instead
+            self.wlan.config(reconnects=0)
+        except Exception:
+            pass
+
+    def is_ready(self):
+        """True while connected; no driver call"""
+        return self.state == CONNECTED
+
+    def _load_cache(self):
+        if not self.cache_file:
+            return
+        try:
+            with open(self.cache_file) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return
+        if cache.get('ssid') == self.ssid:
+            self.bssid = bytes.fromhex(cache['bssid']) if cache.get('bssid') else None
+            self.channel = cache.get('channel')
+
+    def _save_cache(self):
+        if not self.cache_file:
+            return
+        try:
+            with open(self.cache_file, 'w') as f:
+                json.dump({'ssid': self.ssid, 'channel': self.channel,
+                           'bssid': self.bssid.hex() if self.bssid else None}, f)
+        except OSError as e:
+            print("Could not save Wi-Fi cache:", e)
+
+    def _connect(self):
+        if self.failures and self.failures % RESCAN_AFTER == 0:
+            # The AP may have moved: let the driver look for it
+            self.bssid = None
+        print('Connecting to network...')
+        try:
+            if self.bssid is not None:
+                self.wlan.connect(self.ssid, self.password, bssid=self.bssid)
+            else:
+                self.wlan.connect(self.ssid, self.password)
+        except OSError as e:
+            print("Wi-Fi connect error:", e)
+            self._wait()
+            return
+        self.state = CONNECTING
+        self._since = ticks_ms()
+
+    def _wait(self):
+        self.failures += 1
+        self.state = WAITING
+        self._since = ticks_ms()
+        self._pin_channel()
+
+    def _pin_channel(self):
+        if self.link is not None and self.channel:
+            self.link.set_channel(self.channel)
+
+    def _on_connected(self):
+        self.state = CONNECTED
+        self.connects += 1
+        self.failures = 0
+        try:
+            channel = self.wlan.config('channel')
+        except Exception:
+            channel = self.channel
+        try:
+            bssid = self.wlan.config('bssid')
+            bssid = bytes(bssid) if bssid else self.bssid
+        except Exception:
+            bssid = self.bssid  # not every port reports it
+        if channel != self.channel:
+            print("AP on channel {}: set the sender to this channel".format(channel))
+        if channel != self.channel or bssid != self.bssid or self.connects == 1:
+            self.channel = channel
+            self.bssid = bssid
+            self._save_cache()
+        if self.link is not None:
+            self.link.channel = channel
+        print('Network config:', self.wlan.ifconfig())
+
+    def poll(self):
+        """Advances the state machine. Returns ms until it wants to run again."""
+        now = ticks_ms()
+        if self.state == CONNECTED:
+            if self.wlan.isconnected():
+                return CHECK_MS
+            print("Wi-Fi connection lost")
+            self.drops += 1
+            # Rejoin straight away with the cached BSSID
+            self._connect()
+            return POLL_MS
+
+        if self.state == CONNECTING:
+            if self.wlan.isconnected():
+                self._on_connected()
+                return CHECK_MS
+            status = self.wlan.status()
+            if status in _FAILED or ticks_diff(now, self._since) > self.timeout_ms:
+                print("Wi-Fi connect failed ({})".format(status))
+                try:
+                    self.wlan.disconnect()
+                except OSError:
+                    pass
+                # Keep the cached BSSID: _connect rescans now and then
+                self._wait()
+                return CHECK_MS
+            return POLL_MS
+
+        if self.state == IDLE or ticks_diff(now, self._since) >= self.retry_ms:
+            if self.wlan.isconnected():
+                self._on_connected()
+                return CHECK_MS
+            self._connect()
+            return POLL_MS
+        return CHECK_MS